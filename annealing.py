@@ -1,10 +1,10 @@
+import bisect
 import json
 import math
-import random
 import copy
+import time
 
-# Set a random seed for reproducibility
-random.seed(42)
+import numpy as np
 
 
 # Haversine formula to calculate distance between two lat/lng points
@@ -21,55 +21,187 @@ def haversine_distance(lat1, lng1, lat2, lng2):
     return R * c  # Distance in kilometers
 
 
-# Calculate the total distance for all vehicle routes
-def total_distance(routes, depot_location, weight_distance, weight_time):
-    total_dist = 0
+# Same formula as haversine_distance, vectorized over numpy arrays
+def haversine_vector(lat1, lng1, lat2, lng2):
+    R = 6371  # Radius of the Earth in kilometers
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    dlat = lat2 - lat1
+    dlng = lat2 - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c  # Distance in kilometers
+
+
+# Precompute pairwise distances: index 0 is the depot, index i + 1 is orders[i]
+def distance_matrix(orders, depot_location):
+    points = [(depot_location["lat"], depot_location["lng"])] + [
+        (order["location"]["lat"], order["location"]["lng"]) for order in orders
+    ]
+    return [
+        [haversine_distance(lat1, lng1, lat2, lng2) for lat2, lng2 in points]
+        for lat1, lng1 in points
+    ]
+
+
+# Average speed in km/h; travel time is counted up to a route's last order
+AVERAGE_SPEED = 30
+
+
+# Score per km of a leg away from the depot: it counts towards both distance and
+# travel time. Legs back into the depot only count towards distance
+# (weight_distance per km), as in route_summary.
+def score_per_km(weight_distance, weight_time):
+    return weight_distance + weight_time / AVERAGE_SPEED
+
+
+# Distance, travel time and load of a single route (depot -> orders -> depot)
+def route_summary(route, depot_location):
+    route_dist = 0
+    route_time = 0
+    route_weight = 0
+    route_volume = 0
     depot_lat, depot_lng = depot_location["lat"], depot_location["lng"]
 
-    # For demonstration, let's assume we also have time calculations.
-    total_time = (
-        0  # Placeholder for total time (can be replaced with actual time calculation)
-    )
+    prev_lat, prev_lng = depot_lat, depot_lng
+    for order in route:
+        distance = haversine_distance(
+            prev_lat, prev_lng, order["location"]["lat"], order["location"]["lng"]
+        )
+        route_dist += distance
+        route_time += distance / AVERAGE_SPEED
+        route_weight += order["weight"]
+        route_volume += order["volume"]
+        prev_lat, prev_lng = order["location"]["lat"], order["location"]["lng"]
+    route_dist += haversine_distance(
+        prev_lat, prev_lng, depot_lat, depot_lng
+    )  # Return to depot
+
+    return route_dist, route_time, route_weight, route_volume
 
-    for route in routes:
-        prev_lat, prev_lng = depot_lat, depot_lng
-        for order in route:
-            distance = haversine_distance(
-                prev_lat, prev_lng, order["location"]["lat"], order["location"]["lng"]
-            )
-            total_dist += distance
-            total_time += distance / 30  # Assuming an average speed of 30 km/h
-            prev_lat, prev_lng = order["location"]["lat"], order["location"]["lng"]
-        total_dist += haversine_distance(
-            prev_lat, prev_lng, depot_lat, depot_lng
-        )  # Return to depot
+
+# Combine per-route summaries into the weighted score
+def summaries_score(summaries, weight_distance, weight_time):
+    total_dist = 0
+    total_time = 0
+    for route_dist, route_time, _, _ in summaries:
+        total_dist += route_dist
+        total_time += route_time
 
     # Combine distance and time into a weighted score
     score = (weight_distance * total_dist) + (weight_time * total_time)
     return score, total_dist, total_time
 
 
-# Generate a random neighbor using different types of moves
-def generate_neighbor(routes):
-    move_type = random.choice(["swap", "relocate", "2-opt", "multiple_swap"])
+# Check per-route summaries against vehicle capacities
+def summaries_valid(summaries, vehicles):
+    for i, (_, _, route_weight, route_volume) in enumerate(summaries):
+        if (
+            route_weight > vehicles[i]["capacity_weight"]
+            or route_volume > vehicles[i]["capacity_volume"]
+        ):
+            return False
+    return True
+
+
+# Calculate the total distance for all vehicle routes.
+# With an oracle (distance_oracle.DistanceOracle) legs come from it instead.
+def total_distance(routes, depot_location, weight_distance, weight_time, oracle=None):
+    if oracle is not None:
+        return oracle.total_distance(routes, weight_distance, weight_time)
+    summaries = [route_summary(route, depot_location) for route in routes]
+    return summaries_score(summaries, weight_distance, weight_time)
+
+
+MOVE_TYPES = ["swap", "relocate", "2-opt", "multiple_swap"]
+
+
+# Random source for a run: accepts a seed, a numpy SeedSequence or a Generator.
+# Every run owns its own PCG64 generator, so chains never share RNG state.
+def make_rng(seed=None):
+    return np.random.default_rng(seed)
+
+
+# Two distinct route indices
+def pick_two_routes(routes, rng):
+    route1, route2 = rng.choice(len(routes), 2, replace=False).tolist()
+    return route1, route2
+
+
+# Cumulative move probabilities from weights over MOVE_TYPES (None: uniform)
+def move_distribution(move_weights):
+    if move_weights is None:
+        return None
+    if len(move_weights) != len(MOVE_TYPES):
+        raise ValueError(f"Expected one move weight per move type: {MOVE_TYPES}")
+    cumulative = np.cumsum(move_weights, dtype=float)
+    return (cumulative / cumulative[-1]).tolist()
+
+
+# Generate a random neighbor using different types of moves, uniformly or from
+# a move_distribution. Returns the move type along with the new routes.
+# If edges is a list, the move appends the edges it toggles (see below).
+def generate_neighbor(routes, rng, move_cdf=None, edges=None):
+    if move_cdf is None:
+        move_type = MOVE_TYPES[rng.integers(len(MOVE_TYPES))]
+    else:
+        k = bisect.bisect_right(move_cdf, rng.random())
+        move_type = MOVE_TYPES[min(k, len(MOVE_TYPES) - 1)]
+    if len(routes) < 2:
+        move_type = "2-opt"  # A single vehicle only allows moves within its route
     if move_type == "swap":
-        return swap_move(routes)
+        return move_type, swap_move(routes, rng, edges)
     elif move_type == "relocate":
-        return relocate_move(routes)
+        return move_type, relocate_move(routes, rng, edges)
     elif move_type == "2-opt":
-        return two_opt_move(routes)
+        return move_type, two_opt_move(routes, rng, edges)
     elif move_type == "multiple_swap":
-        return multiple_swap_move(routes)
+        return move_type, multiple_swap_move(routes, rng, edges)
+
+
+# Moves copy only the routes they modify; untouched routes stay shared with
+# the parent solution so evaluation can skip them. Orders are never mutated.
+# Given an edges list, a move also appends every route edge it removes or adds
+# as (route index, end, end), an end being an order or the ROUTE_START /
+# ROUTE_END depot sentinel. That is enough to update a solution hash in O(1).
+ROUTE_START = "route_start"
+ROUTE_END = "route_end"
+
+
+# Orders (or depot sentinels) next to position i of a route
+def around(route, i):
+    before = route[i - 1] if i > 0 else ROUTE_START
+    after = route[i + 1] if i + 1 < len(route) else ROUTE_END
+    return before, after
+
+
+# Edges toggled by swapping routes[route1][i] with routes[route2][j]
+def swap_edges(routes, route1, i, route2, j):
+    x, y = routes[route1][i], routes[route2][j]
+    p1, n1 = around(routes[route1], i)
+    p2, n2 = around(routes[route2], j)
+    return [
+        (route1, p1, x),
+        (route1, x, n1),
+        (route1, p1, y),
+        (route1, y, n1),
+        (route2, p2, y),
+        (route2, y, n2),
+        (route2, p2, x),
+        (route2, x, n2),
+    ]
 
 
 # Swap move: Swap two orders between two routes
-def swap_move(routes):
-    new_routes = copy.deepcopy(routes)
-    route1, route2 = random.sample(range(len(new_routes)), 2)
+def swap_move(routes, rng, edges=None):
+    new_routes = list(routes)
+    route1, route2 = pick_two_routes(new_routes, rng)
     if len(new_routes[route1]) > 0 and len(new_routes[route2]) > 0:
-        i, j = random.randint(0, len(new_routes[route1]) - 1), random.randint(
-            0, len(new_routes[route2]) - 1
-        )
+        new_routes[route1] = list(new_routes[route1])
+        new_routes[route2] = list(new_routes[route2])
+        i = int(rng.integers(len(new_routes[route1])))
+        j = int(rng.integers(len(new_routes[route2])))
+        if edges is not None:
+            edges += swap_edges(new_routes, route1, i, route2, j)
         new_routes[route1][i], new_routes[route2][j] = (
             new_routes[route2][j],
             new_routes[route1][i],
@@ -78,14 +210,19 @@ def swap_move(routes):
 
 
 # Multiple swaps: Swap multiple pairs of orders between routes
-def multiple_swap_move(routes):
-    new_routes = copy.deepcopy(routes)
-    for _ in range(random.randint(2, 4)):  # Number of swaps can be configured
-        route1, route2 = random.sample(range(len(new_routes)), 2)
+def multiple_swap_move(routes, rng, edges=None):
+    new_routes = list(routes)
+    for _ in range(rng.integers(2, 5)):  # Number of swaps can be configured
+        route1, route2 = pick_two_routes(new_routes, rng)
         if len(new_routes[route1]) > 0 and len(new_routes[route2]) > 0:
-            i, j = random.randint(0, len(new_routes[route1]) - 1), random.randint(
-                0, len(new_routes[route2]) - 1
-            )
+            if new_routes[route1] is routes[route1]:
+                new_routes[route1] = list(new_routes[route1])
+            if new_routes[route2] is routes[route2]:
+                new_routes[route2] = list(new_routes[route2])
+            i = int(rng.integers(len(new_routes[route1])))
+            j = int(rng.integers(len(new_routes[route2])))
+            if edges is not None:
+                edges += swap_edges(new_routes, route1, i, route2, j)
             new_routes[route1][i], new_routes[route2][j] = (
                 new_routes[route2][j],
                 new_routes[route1][i],
@@ -94,23 +231,51 @@ def multiple_swap_move(routes):
 
 
 # Relocate move: Move one order from one route to another
-def relocate_move(routes):
-    new_routes = copy.deepcopy(routes)
-    route1, route2 = random.sample(range(len(new_routes)), 2)
+def relocate_move(routes, rng, edges=None):
+    new_routes = list(routes)
+    route1, route2 = pick_two_routes(new_routes, rng)
     if len(new_routes[route1]) > 0:
-        i = random.randint(0, len(new_routes[route1]) - 1)
+        new_routes[route1] = list(new_routes[route1])
+        new_routes[route2] = list(new_routes[route2])
+        i = int(rng.integers(len(new_routes[route1])))
+        if edges is not None:
+            before, after = around(new_routes[route1], i)
+            order = new_routes[route1][i]
+            edges += [
+                (route1, before, order),
+                (route1, order, after),
+                (route1, before, after),
+            ]
         order = new_routes[route1].pop(i)
-        insert_position = random.randint(0, len(new_routes[route2]))
+        insert_position = int(rng.integers(len(new_routes[route2]) + 1))
+        if edges is not None:
+            target = new_routes[route2]
+            before = target[insert_position - 1] if insert_position > 0 else ROUTE_START
+            after = target[insert_position] if insert_position < len(target) else ROUTE_END
+            edges += [
+                (route2, before, after),
+                (route2, before, order),
+                (route2, order, after),
+            ]
         new_routes[route2].insert(insert_position, order)
     return new_routes
 
 
 # 2-opt move: Reverse a segment of a route to reduce distance
-def two_opt_move(routes):
-    new_routes = copy.deepcopy(routes)
-    route = random.choice(new_routes)
-    if len(route) > 2:
-        i, j = sorted(random.sample(range(len(route)), 2))
+def two_opt_move(routes, rng, edges=None):
+    new_routes = list(routes)
+    k = int(rng.integers(len(new_routes)))
+    if len(new_routes[k]) > 2:
+        route = new_routes[k] = list(new_routes[k])
+        i, j = sorted(rng.choice(len(route), 2, replace=False).tolist())
+        if edges is not None:
+            before, after = around(route, i)[0], around(route, j)[1]
+            edges += [
+                (k, before, route[i]),
+                (k, route[j], after),
+                (k, before, route[j]),
+                (k, route[i], after),
+            ]
         route[i : j + 1] = reversed(route[i : j + 1])
     return new_routes
 
@@ -138,60 +303,261 @@ def simulated_annealing(
     max_iterations,
     weight_distance,
     weight_time,
+    polish=None,
+    cache=None,
+    rng=None,
+    stats=None,
+    checkpointer=None,
+    resume=None,
+    penalty=None,
+    progress=None,
+    target_score=None,
+    oracle=None,
+    move_weights=None,
+    time_limit=None,
+    tabu=None,
+    initial_solution=None,
 ):
-    # Initial random solution
-    routes = [[] for _ in vehicles]
-    random.shuffle(orders)
-    for i, order in enumerate(orders):
-        routes[i % len(vehicles)].append(order)
+    rng = make_rng(rng)
+    move_cdf = move_distribution(move_weights)
+    # Wall-clock budget in seconds, on top of max_iterations
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+
+    if resume is not None:
+        # Continue a checkpointed run exactly where it stopped
+        routes = resume["current_solution"]
+        rng.bit_generator.state = resume["rng_state"]
+    elif initial_solution is not None:
+        # Warm start, e.g. from a related instance's solution
+        routes = [list(route) for route in initial_solution]
+    else:
+        # Initial random solution
+        routes = [[] for _ in vehicles]
+        for i, k in enumerate(rng.permutation(len(orders))):
+            routes[i % len(vehicles)].append(orders[k])
+
+    # Per-route summaries, optionally memoized across moves, restarts and chains
+    if cache is not None:
+        evaluate = cache.evaluate
+    elif oracle is not None:
+        evaluate = oracle.route_summary
+    else:
+        evaluate = lambda route: route_summary(route, depot_location)
 
     current_solution = routes
-    current_score, current_distance, current_time = total_distance(
-        current_solution, depot_location, weight_distance, weight_time
+    current_summaries = [evaluate(route) for route in current_solution]
+    current_score, current_distance, current_time = summaries_score(
+        current_summaries, weight_distance, weight_time
     )
 
+    # With a penalty, infeasible solutions are searched but never become the best
+    current_feasible = summaries_valid(current_summaries, vehicles)
+    if penalty is not None:
+        current_excess = penalty.excess(current_summaries, vehicles)
+
     best_solution = copy.deepcopy(current_solution)
     best_score = current_score
+    if penalty is not None and not current_feasible:
+        best_score = math.inf
 
     temperature = initial_temp
+    start_iteration = 0
+    edges = None
+
+    if resume is not None:
+        best_solution = resume["best_solution"]
+        best_score = resume["best_score"]
+        temperature = resume["temperature"]
+        start_iteration = resume["iteration"]
+        if penalty is not None and resume.get("penalty") is not None:
+            penalty.restore(resume["penalty"])
+
+    # Everything needed to continue the run from the top of an iteration
+    def checkpoint_state(iteration):
+        return {
+            "iteration": iteration,
+            "temperature": temperature,
+            "current_solution": current_solution,
+            "best_solution": best_solution,
+            "best_score": best_score,
+            "rng_state": rng.bit_generator.state,
+            "stats": stats,
+            "penalty": None if penalty is None else penalty.state(),
+            "params": {
+                "initial_temp": initial_temp,
+                "cooling_rate": cooling_rate,
+                "max_iterations": max_iterations,
+                "weight_distance": weight_distance,
+                "weight_time": weight_time,
+            },
+        }
+
+    # Neighbors whose hash is in the tabu table are skipped unevaluated; that
+    # includes undoing the last move and re-proposing a rejected neighbor
+    if tabu is not None:
+        current_hash = tabu.solution_hash(current_solution)
+        tabu.remember(current_hash, start_iteration)
+
+    # Instrumentation is opt-in; without stats the clock is a no-op
+    clock = time.perf_counter if stats is not None else (lambda: 0.0)
 
-    for iteration in range(max_iterations):
+    for iteration in range(start_iteration, max_iterations):
         if temperature <= 0:
             break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
 
-        new_solution = generate_neighbor(current_solution)
+        if checkpointer is not None and checkpointer.due():
+            checkpointer.save(checkpoint_state(iteration))
 
-        if not is_valid(new_solution, vehicles):
-            continue
+        # Sampled before the move, so iterations that skip an invalid or tabu
+        # neighbor are not lost from the trajectory
+        if stats is not None and iteration % stats.trajectory_stride == 0:
+            stats.sample(iteration, temperature, current_score, best_score)
+
+        started = clock()
+        if tabu is not None:
+            edges = []
+        move_type, new_solution = generate_neighbor(
+            current_solution, rng, move_cdf, edges
+        )
+        generated = clock()
+
+        if tabu is not None:
+            new_hash = tabu.toggle(current_hash, edges)
+            if tabu.seen(new_hash, iteration):
+                if stats is not None:
+                    stats.record_move(
+                        move_type, generated - started, 0.0, 0.0, tabu_skipped=True
+                    )
+                continue
+            tabu.remember(new_hash, iteration)
 
-        new_score, new_distance, new_time = total_distance(
-            new_solution, depot_location, weight_distance, weight_time
+        # Only routes the move replaced need evaluating
+        new_summaries = [
+            summary if new_route is route else evaluate(new_route)
+            for new_route, route, summary in zip(
+                new_solution, current_solution, current_summaries
+            )
+        ]
+        new_score, new_distance, new_time = summaries_score(
+            new_summaries, weight_distance, weight_time
         )
+        scored = clock()
 
+        valid = summaries_valid(new_summaries, vehicles)
+        checked = clock()
+
+        if not valid and penalty is None:
+            if stats is not None:
+                stats.record_move(
+                    move_type,
+                    generated - started,
+                    checked - scored,
+                    scored - generated,
+                    valid=False,
+                )
+            continue
+
+        # Capacity violations are priced in under the current penalty coefficients
+        new_cost, current_cost = new_score, current_score
+        if penalty is not None:
+            new_excess = penalty.excess(new_summaries, vehicles)
+            new_cost += penalty.cost(new_excess)
+            current_cost += penalty.cost(current_excess)
+
+        improved = new_cost < current_cost
         accepted = False
         # Accept new solution with a probability based on temperature
-        if new_score < current_score or random.uniform(0, 1) < math.exp(
-            (current_score - new_score) / temperature
+        if improved or rng.random() < math.exp(
+            (current_cost - new_cost) / temperature
         ):
             current_solution = new_solution
+            current_summaries = new_summaries
             current_score = new_score
             current_distance = new_distance
             current_time = new_time
+            current_feasible = valid
+            if penalty is not None:
+                current_excess = new_excess
+            if tabu is not None:
+                current_hash = new_hash
             accepted = True
 
         # Update the best solution found
-        if current_score < best_score:
+        if current_score < best_score and (penalty is None or current_feasible):
             best_solution = copy.deepcopy(current_solution)
             best_score = current_score
+            # Stream improvements, e.g. to a UI; the callback must not mutate the solution
+            if progress is not None:
+                progress(iteration, best_solution, best_score)
+
+        if penalty is not None:
+            penalty.update(current_excess)
 
-        # Logging for debugging
-        # print(f"Iteration {iteration + 1}, Temp: {temperature:.2f}, Current Score: {current_score:.2f}, "
-        #       f"Best Score: {best_score:.2f}, Current Distance: {current_distance:.2f}, "
-        #       f"Current Time: {current_time:.2f}, Accepted: {'Yes' if accepted else 'No'}")
+        if stats is not None:
+            stats.record_move(
+                move_type,
+                generated - started,
+                checked - scored,
+                scored - generated,
+                valid=valid,
+                accepted=accepted,
+                improved=improved,
+            )
 
         temperature *= cooling_rate
 
-    return best_solution, best_score
+        # Stop early once the best score is good enough, e.g. within a gap of a lower bound
+        if target_score is not None and best_score <= target_score:
+            iteration += 1
+            break
+    else:
+        iteration = max_iterations
+
+    if checkpointer is not None:
+        checkpointer.save(checkpoint_state(iteration))
+
+    return polish_solution(
+        best_solution,
+        best_score,
+        vehicles,
+        depot_location,
+        weight_distance,
+        weight_time,
+        polish,
+        oracle,
+    )
+
+
+# Optional steepest-descent polish (see local_search.py) of a feasible solution.
+# The solution is kept unless the polish actually lowers its score.
+def polish_solution(
+    solution,
+    score,
+    vehicles,
+    depot_location,
+    weight_distance,
+    weight_time,
+    strategy,
+    oracle=None,
+):
+    if strategy is None or score == math.inf:
+        return solution, score
+    from local_search import local_search
+
+    polished, polished_score = local_search(
+        solution,
+        vehicles,
+        depot_location,
+        weight_distance,
+        weight_time,
+        strategy=strategy,
+        oracle=oracle,
+    )
+    if polished_score < score:
+        return polished, polished_score
+    return solution, score
 
 
 # JSON input for vehicles and orders
@@ -1120,16 +1486,34 @@ max_iterations = 10000
 weight_distance = 0.5  # Weight for distance constraint
 weight_time = 0.5  # Weight for time constraint
 
-best_solution, best_score = simulated_annealing(
-    vehicles,
-    orders,
-    depot_location,
-    initial_temp,
-    cooling_rate,
-    max_iterations,
-    weight_distance,
-    weight_time,
-)
+polish = "first"  # Local search after annealing: None, "first" or "best"
+seed = 42  # Master seed for reproducibility
 
-print("Best solution found:", best_solution)
-print("Best score:", best_score)
+if __name__ == "__main__":
+    best_solution, best_score = simulated_annealing(
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        max_iterations,
+        weight_distance,
+        weight_time,
+        polish=polish,
+        rng=seed,
+    )
+
+    from results import route_records
+
+    print("Best solution found:")
+    for record in route_records(best_solution, vehicles, depot_location):
+        print(f"  Vehicle {record['vehicle_id']}: {record['order_ids']}")
+    print("Best score:", best_score)
+
+    from bounds import instance_bounds, optimality_gap
+
+    bounds = instance_bounds(
+        vehicles, orders, depot_location, weight_distance, weight_time, lp=True
+    )
+    print("Lower bound:", bounds["lower_bound"])
+    print(f"Optimality gap: {optimality_gap(best_score, bounds['lower_bound']):.2%}")
@@ -0,0 +1,285 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import annealing
+from annealing import is_valid, simulated_annealing
+from bounds import instance_bounds, optimality_gap
+from chains import chain_seeds
+from distance_oracle import DistanceOracle
+from results import route_records
+from spatial import spatially_sorted
+from tuning import profile_params
+
+
+# Read instances from a directory of *.json files, a JSONL file, or "-" for JSONL on stdin.
+# Each instance is a dict with "vehicles", "orders" and "depot_location";
+# an optional "name" identifies it in the results.
+def load_instances(source):
+    if source != "-" and os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith(".json"):
+                with open(os.path.join(source, filename)) as f:
+                    instance = json.load(f)
+                instance.setdefault("name", filename[: -len(".json")])
+                yield instance
+        return
+
+    stream = sys.stdin if source == "-" else open(source)
+    try:
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                instance = json.loads(line)
+                instance.setdefault("name", f"instance-{line_number}")
+                yield instance
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+# Iteration budget grows with instance size so large instances get longer runs
+def iteration_budget(instance, min_iterations, iterations_per_order, max_iterations):
+    budget = iterations_per_order * len(instance["orders"])
+    return int(min(max(budget, min_iterations), max_iterations))
+
+
+# Rough CPU cost of solving an instance: iterations times average route length
+def estimated_cost(instance, iterations):
+    return iterations * (len(instance["orders"]) / max(len(instance["vehicles"]), 1) + 1)
+
+
+# Group jobs into tasks: large jobs run alone, small ones are packed together
+# until a bundle's estimated cost reaches pack_cost. Heaviest tasks go first
+# (longest-processing-time order) so no long job starts last.
+def pack_jobs(jobs, pack_cost):
+    tasks, bundle, bundle_cost = [], [], 0
+    for job in sorted(jobs, key=lambda job: job["cost"], reverse=True):
+        if job["cost"] >= pack_cost:
+            tasks.append([job])
+            continue
+        bundle.append(job)
+        bundle_cost += job["cost"]
+        if bundle_cost >= pack_cost:
+            tasks.append(bundle)
+            bundle, bundle_cost = [], 0
+    if bundle:
+        tasks.append(bundle)
+    tasks.sort(key=lambda task: sum(job["cost"] for job in task), reverse=True)
+    return tasks
+
+
+# Solve one instance; routes are reported as in results.route_records.
+# The run stops early once its gap to the instance's lower bound reaches target_gap.
+# Instances with more than sparse_above orders use a sparse distance oracle.
+# A tuned profile (see tuning.py) overrides the annealing parameters per size class,
+# and its time budget replaces the iteration budget, since the parameters were
+# tuned for that stopping rule. Time-limited runs do not reproduce exactly.
+def solve_instance(job, params):
+    instance = job["instance"]
+    started = time.perf_counter()
+    tuned = profile_params(params["profiles"] or {}, instance)
+    oracle = None
+    if len(instance["orders"]) > params["sparse_above"]:
+        oracle = DistanceOracle(
+            spatially_sorted(instance["orders"]), instance["depot_location"]
+        )
+    bounds = instance_bounds(
+        instance["vehicles"],
+        instance["orders"],
+        instance["depot_location"],
+        params["weight_distance"],
+        params["weight_time"],
+        lp=params["lp_bound"],
+    )
+    # No target from an infinite bound: no solution could meet it
+    target_score = None
+    if params["target_gap"] is not None and bounds["lower_bound"] < math.inf:
+        target_score = bounds["lower_bound"] / (1 - params["target_gap"])
+
+    best_solution, best_score = simulated_annealing(
+        instance["vehicles"],
+        instance["orders"],
+        instance["depot_location"],
+        tuned.get("initial_temp", params["initial_temp"]),
+        tuned.get("cooling_rate", params["cooling_rate"]),
+        tuned.get("max_iterations", job["iterations"]),
+        params["weight_distance"],
+        params["weight_time"],
+        polish=params["polish"],
+        rng=job["seed"],
+        target_score=target_score,
+        oracle=oracle,
+        move_weights=tuned.get("move_weights"),
+        time_limit=tuned.get("time_limit"),
+    )
+    # Without a penalty the best solution can still break capacity, e.g. when
+    # the fleet is too small for the load; such a run has no gap
+    feasible = best_score < math.inf and is_valid(best_solution, instance["vehicles"])
+    return {
+        "name": instance["name"],
+        "best_score": best_score,
+        "feasible": feasible,
+        "lower_bound": bounds["lower_bound"],
+        "gap": optimality_gap(best_score, bounds["lower_bound"]) if feasible else math.inf,
+        "iterations": tuned.get("max_iterations", job["iterations"]),
+        "time_limit": tuned.get("time_limit"),
+        "elapsed": time.perf_counter() - started,
+        "routes": list(
+            route_records(
+                best_solution, instance["vehicles"], instance["depot_location"], oracle
+            )
+        ),
+    }
+
+
+# JSON has no infinity: a missing score, bound or gap (e.g. when the fleet
+# cannot carry the load) is written as null
+def json_record(result):
+    record = {
+        key: None if isinstance(value, float) and math.isinf(value) else value
+        for key, value in result.items()
+    }
+    return json.dumps(record, allow_nan=False)
+
+
+def solve_task(task, params):
+    return [solve_instance(job, params) for job in task]
+
+
+# Solve many independent instances over a process pool.
+# Yields one result per instance as soon as its task completes. Each instance's
+# seed is derived from master_seed by input position, so results do not depend
+# on scheduling or worker count.
+def solve_batch(
+    instances,
+    initial_temp=annealing.initial_temp,
+    cooling_rate=annealing.cooling_rate,
+    weight_distance=annealing.weight_distance,
+    weight_time=annealing.weight_time,
+    polish=annealing.polish,
+    master_seed=annealing.seed,
+    min_iterations=2000,
+    iterations_per_order=100,
+    max_iterations=200000,
+    pack_cost=2e6,
+    target_gap=None,
+    lp_bound=False,
+    sparse_above=5000,
+    profiles=None,
+    workers=None,
+):
+    instances = list(instances)
+    params = {
+        "initial_temp": initial_temp,
+        "cooling_rate": cooling_rate,
+        "weight_distance": weight_distance,
+        "weight_time": weight_time,
+        "polish": polish,
+        "target_gap": target_gap,
+        "lp_bound": lp_bound,
+        "sparse_above": sparse_above,
+        "profiles": profiles,
+    }
+    jobs = []
+    for instance, seed in zip(instances, chain_seeds(master_seed, len(instances))):
+        iterations = iteration_budget(
+            instance, min_iterations, iterations_per_order, max_iterations
+        )
+        jobs.append(
+            {
+                "instance": instance,
+                "iterations": iterations,
+                "seed": seed,
+                "cost": estimated_cost(instance, iterations),
+            }
+        )
+
+    tasks = pack_jobs(jobs, pack_cost)
+    if workers == 1:
+        for task in tasks:
+            yield from solve_task(task, params)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(solve_task, task, params) for task in tasks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Solve many vehicle routing instances in parallel."
+    )
+    parser.add_argument(
+        "source", help="directory of .json instances, a .jsonl file, or - for stdin"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSONL results file (default: stdout)"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=annealing.seed)
+    parser.add_argument("--initial-temp", type=float, default=annealing.initial_temp)
+    parser.add_argument("--cooling-rate", type=float, default=annealing.cooling_rate)
+    parser.add_argument("--min-iterations", type=int, default=2000)
+    parser.add_argument("--iterations-per-order", type=int, default=100)
+    parser.add_argument("--max-iterations", type=int, default=200000)
+    parser.add_argument(
+        "--polish", choices=["none", "first", "best"], default=annealing.polish or "none"
+    )
+    parser.add_argument(
+        "--target-gap",
+        type=float,
+        default=None,
+        help="stop an instance once within this relative gap of its lower bound",
+    )
+    parser.add_argument(
+        "--lp-bound", action="store_true", help="add the LP bound (needs scipy)"
+    )
+    parser.add_argument(
+        "--sparse-above",
+        type=int,
+        default=5000,
+        help="use a sparse distance oracle for instances with more orders than this",
+    )
+    parser.add_argument(
+        "--profile", help="tuned parameter profile JSON written by tuning.py"
+    )
+    args = parser.parse_args(argv)
+
+    profiles = None
+    if args.profile:
+        with open(args.profile) as f:
+            profiles = json.load(f)
+
+    results = solve_batch(
+        load_instances(args.source),
+        initial_temp=args.initial_temp,
+        cooling_rate=args.cooling_rate,
+        polish=None if args.polish == "none" else args.polish,
+        master_seed=args.seed,
+        min_iterations=args.min_iterations,
+        iterations_per_order=args.iterations_per_order,
+        max_iterations=args.max_iterations,
+        target_gap=args.target_gap,
+        lp_bound=args.lp_bound,
+        sparse_above=args.sparse_above,
+        profiles=profiles,
+        workers=args.workers,
+    )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in results:
+            output.write(json_record(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
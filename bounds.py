@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+
+from annealing import haversine_distance, haversine_vector, score_per_km
+
+try:
+    from scipy.optimize import linprog
+    from scipy.sparse import coo_matrix
+except ImportError:  # the LP bound is optional
+    linprog = None
+
+
+# Fewest vehicles that can carry the total load: the k largest capacities must
+# cover it, for weight and volume alike (bin-packing L1 bound)
+def min_vehicles(vehicles, orders):
+    needed = 0
+    for load_key, capacity_key in (
+        ("weight", "capacity_weight"),
+        ("volume", "capacity_volume"),
+    ):
+        total = sum(order[load_key] for order in orders)
+        capacities = sorted((v[capacity_key] for v in vehicles), reverse=True)
+        k, covered = 0, 0
+        while covered < total and k < len(capacities):
+            covered += capacities[k]
+            k += 1
+        if covered < total:
+            return math.inf
+        needed = max(needed, k)
+    return max(needed, 1 if orders else 0)
+
+
+# Edge weights of a minimum spanning tree over the orders (Prim, O(n^2) time,
+# O(n) memory). Distances are computed row by row and symmetrized with the
+# cheaper direction, so the tree is a valid bound even for asymmetric distances.
+def mst_edge_weights(lats, lngs):
+    n = len(lats)
+    in_tree = np.zeros(n, dtype=bool)
+    best = np.full(n, np.inf)
+    best[0] = 0.0
+    weights = []
+    for step in range(n):
+        u = int(np.argmin(np.where(in_tree, np.inf, best)))
+        if step > 0:
+            weights.append(best[u])
+        in_tree[u] = True
+        row = np.minimum(
+            haversine_vector(lats[u], lngs[u], lats, lngs),
+            haversine_vector(lats, lngs, lats[u], lngs[u]),
+        )
+        best = np.where(in_tree, best, np.minimum(best, row))
+    return np.sort(np.array(weights))
+
+
+# Lower bound on the weighted score from a spanning forest and depot legs.
+# With k non-empty routes a solution has k legs out of the depot (to distinct
+# orders), k legs back, and order-to-order legs forming k paths; those paths
+# weigh at least the MST minus its k - 1 heaviest edges. Unused vehicles pay the
+# depot -> depot leg, as in total_distance. Minimized over every feasible k.
+# Without tree the order-to-order legs are bounded by zero, which skips the
+# O(n^2) MST and leaves only the depot legs.
+def spanning_bound(
+    vehicles, orders, depot_location, weight_distance, weight_time, k_min, tree=True
+):
+    n, n_vehicles = len(orders), len(vehicles)
+    depot_lat, depot_lng = depot_location["lat"], depot_location["lng"]
+    empty_route = haversine_distance(depot_lat, depot_lng, depot_lat, depot_lng)
+    if n == 0:
+        return n_vehicles * empty_route, weight_distance * n_vehicles * empty_route
+
+    lats = np.array([order["location"]["lat"] for order in orders])
+    lngs = np.array([order["location"]["lng"] for order in orders])
+    out_legs = np.cumsum(np.sort(haversine_vector(depot_lat, depot_lng, lats, lngs)))
+    return_legs = np.cumsum(
+        np.sort(haversine_vector(lats, lngs, depot_lat, depot_lng))
+    )
+    tree = mst_edge_weights(lats, lngs) if tree else np.zeros(n - 1)
+    tree_total = tree.sum()
+    heaviest = np.concatenate(([0.0], np.cumsum(tree[::-1])))
+
+    leg_weight = score_per_km(weight_distance, weight_time)
+    distance_bound = score_bound = math.inf
+    for k in range(max(k_min, 1), min(n_vehicles, n) + 1):
+        forest = tree_total - heaviest[k - 1]
+        unused = (n_vehicles - k) * empty_route
+        distance_bound = min(
+            distance_bound, forest + out_legs[k - 1] + return_legs[k - 1] + unused
+        )
+        score_bound = min(
+            score_bound,
+            leg_weight * (forest + out_legs[k - 1])
+            + weight_distance * (return_legs[k - 1] + unused),
+        )
+    return float(distance_bound), float(score_bound)
+
+
+# Assignment LP relaxation (HiGHS via scipy): every order has one leg in and one
+# leg out, the depot sends and receives one leg per vehicle, and a depot -> depot
+# leg stands for an unused vehicle. Returns None without scipy or above max_orders.
+def lp_bound(
+    vehicles,
+    orders,
+    depot_location,
+    weight_distance,
+    weight_time,
+    k_min,
+    max_orders=300,
+):
+    if linprog is None or len(orders) > max_orders:
+        return None
+    n, n_vehicles = len(orders), len(vehicles)
+    lats = np.array([depot_location["lat"]] + [o["location"]["lat"] for o in orders])
+    lngs = np.array([depot_location["lng"]] + [o["location"]["lng"] for o in orders])
+    dist = haversine_vector(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :])
+
+    leg_weight = score_per_km(weight_distance, weight_time)
+    cost = leg_weight * dist
+    cost[:, 0] = weight_distance * dist[:, 0]
+
+    # Variables x[i, j] for every ordered pair except order self-loops
+    i, j = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+    keep = (i != j) | (i == 0)
+    i, j = i[keep], j[keep]
+    variables = np.arange(len(i))
+    rows = np.concatenate((i, n + 1 + j))
+    columns = np.concatenate((variables, variables))
+    equality = coo_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(2 * (n + 1), len(i))
+    )
+    degree = np.ones(2 * (n + 1))
+    degree[0] = degree[n + 1] = n_vehicles
+
+    upper = np.ones(len(i))
+    upper[(i == 0) & (j == 0)] = n_vehicles - k_min
+    upper[(i == 0) & (j != 0)] = 1
+    result = linprog(
+        cost[i, j],
+        A_eq=equality.tocsr(),
+        b_eq=degree,
+        bounds=np.column_stack((np.zeros(len(i)), upper)),
+        method="highs",
+    )
+    return float(result.fun) if result.status == 0 else None
+
+
+# All bounds for an instance; lower_bound is the tightest valid score bound.
+# Above tree_max_orders the spanning bound drops its MST term (2.6 s at 5000
+# orders, growing quadratically); None always builds the tree.
+def instance_bounds(
+    vehicles,
+    orders,
+    depot_location,
+    weight_distance,
+    weight_time,
+    lp=False,
+    tree_max_orders=5000,
+):
+    k_min = min_vehicles(vehicles, orders)
+    bounds = {"min_vehicles": k_min, "feasible_fleet": k_min <= len(vehicles)}
+    if not bounds["feasible_fleet"]:
+        bounds.update(
+            distance_bound=math.inf, score_bound=math.inf, lower_bound=math.inf
+        )
+        return bounds
+
+    bounds["spanning_tree"] = tree_max_orders is None or len(orders) <= tree_max_orders
+    distance_bound, score_bound = spanning_bound(
+        vehicles,
+        orders,
+        depot_location,
+        weight_distance,
+        weight_time,
+        k_min,
+        tree=bounds["spanning_tree"],
+    )
+    bounds["distance_bound"] = distance_bound
+    bounds["score_bound"] = score_bound
+    bounds["lower_bound"] = score_bound
+    if lp:
+        bounds["lp_bound"] = lp_bound(
+            vehicles, orders, depot_location, weight_distance, weight_time, k_min
+        )
+        if bounds["lp_bound"] is not None:
+            bounds["lower_bound"] = max(score_bound, bounds["lp_bound"])
+    return bounds
+
+
+# Relative gap between a score and a lower bound. Infinite when there is no
+# finite score or no finite bound, i.e. when the fleet cannot carry the load.
+def optimality_gap(best_score, lower_bound):
+    if best_score == math.inf or lower_bound == math.inf:
+        return math.inf
+    if best_score <= 0:
+        return 0.0
+    return max(best_score - lower_bound, 0.0) / best_score
@@ -0,0 +1,209 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import sysconfig
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+import annealing
+from annealing import simulated_annealing
+
+BACKENDS = ("auto", "threads", "processes")
+
+# Plug-ins that carry per-run state; a chain gets its own copy of each. A
+# RouteCache is not among them: it memoizes a pure function, so chains in one
+# process share it (see route_cache.py).
+PER_CHAIN_PLUGINS = ("stats", "penalty", "tabu")
+
+
+# Independent seeds for n chains, derived from one master seed.
+# Chain i always receives the i-th child, whichever worker ends up running it,
+# so results reproduce bit-for-bit regardless of the worker count.
+def chain_seeds(master_seed, n_chains):
+    return np.random.SeedSequence(master_seed).spawn(n_chains)
+
+
+# Is this a free-threaded interpreter running with the GIL off? A 3.13t build
+# can still re-enable the GIL (PYTHON_GIL=1 or an incompatible extension).
+def free_threaded():
+    if not sysconfig.get_config_var("Py_GIL_DISABLED"):
+        return False
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+# "auto" picks threads on a free-threaded interpreter and processes otherwise
+def resolve_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend == "auto":
+        return "threads" if free_threaded() else "processes"
+    return backend
+
+
+# Run one chain; the seed sequence becomes the chain's own PCG64 generator.
+# Returns (solution, score, stats), stats being the chain's own copy or None.
+def run_chain(seed_sequence, args, kwargs):
+    solution, score = simulated_annealing(*args, rng=seed_sequence, **kwargs)
+    return solution, score, kwargs.get("stats")
+
+
+# Keyword arguments for one chain run in this process. Stateful plug-ins are
+# copied, as the process backend copies them by pickling, so no chain sees
+# another's penalty, tabu or stats state; the oracle becomes an overlay that
+# shares its kNN arrays but has its own fallback cache. Everything else,
+# including the instance and a route cache, is shared.
+def chain_kwargs(kwargs):
+    kwargs = dict(kwargs)
+    memo = {}
+    oracle = kwargs.get("oracle")
+    if oracle is not None:
+        kwargs["oracle"] = memo[id(oracle)] = oracle.overlay()
+    for name in PER_CHAIN_PLUGINS:
+        if kwargs.get(name) is not None:
+            kwargs[name] = copy.deepcopy(kwargs[name], memo)
+    return kwargs
+
+
+# Run independent annealing chains in parallel and keep the best result.
+# Returns the best solution and score plus every chain's (solution, score,
+# stats). A stats plug-in is copied per chain and each chain's copy comes back
+# in its result; the object passed in stays untouched.
+# backend "threads" runs chains in a thread pool over one shared instance, which
+# only runs in parallel on a free-threaded (no-GIL) interpreter; "processes"
+# pickles the instance to each worker process. "auto" picks threads when the
+# GIL is off. Results are identical for every backend and worker count.
+def run_chains(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_distance,
+    weight_time,
+    n_chains=4,
+    master_seed=42,
+    workers=None,
+    backend="auto",
+    **kwargs,
+):
+    args = (
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        max_iterations,
+        weight_distance,
+        weight_time,
+    )
+    seeds = chain_seeds(master_seed, n_chains)
+    backend = resolve_backend(backend)
+
+    if workers == 1:
+        results = [run_chain(seed, args, chain_kwargs(kwargs)) for seed in seeds]
+    elif backend == "threads":
+        per_chain = [chain_kwargs(kwargs) for _ in seeds]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = list(pool.map(run_chain, seeds, repeat(args), per_chain))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_chain, seeds, repeat(args), repeat(kwargs)))
+
+    # Ties go to the lowest chain index, keeping the choice deterministic
+    best_solution, best_score, _ = min(results, key=lambda result: result[1])
+    return best_solution, best_score, results
+
+
+# Time run_chains on each backend over the same chains. Returns one record per
+# backend with its wall time, speedup over one in-process worker and best score.
+def benchmark_backends(
+    vehicles,
+    orders,
+    depot_location,
+    n_chains=4,
+    max_iterations=annealing.max_iterations,
+    workers=None,
+    backends=("threads", "processes"),
+    repeats=1,
+    **kwargs,
+):
+    params = (
+        vehicles,
+        orders,
+        depot_location,
+        annealing.initial_temp,
+        annealing.cooling_rate,
+        max_iterations,
+        annealing.weight_distance,
+        annealing.weight_time,
+    )
+    runs = [("serial", 1)] + [(backend, workers) for backend in backends]
+    records = []
+    for backend, run_workers in runs:
+        elapsed = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            _, best_score, _ = run_chains(
+                *params,
+                n_chains=n_chains,
+                workers=run_workers,
+                backend="processes" if backend == "serial" else backend,
+                **kwargs,
+            )
+            elapsed.append(time.perf_counter() - started)
+        records.append(
+            {"backend": backend, "elapsed": min(elapsed), "best_score": best_score}
+        )
+    for record in records:
+        record["speedup"] = records[0]["elapsed"] / record["elapsed"]
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the thread and process backends of run_chains."
+    )
+    parser.add_argument(
+        "instance", nargs="?", help="instance JSON file (default: the sample in annealing.py)"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--chains", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=annealing.max_iterations)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-polish", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.instance:
+        with open(args.instance) as f:
+            instance = json.load(f)
+    else:
+        instance = annealing.data
+
+    gil = "off (free-threaded)" if free_threaded() else "on"
+    print(f"Python {sys.version.split()[0]}, GIL {gil}, {os.cpu_count()} CPUs")
+    records = benchmark_backends(
+        instance["vehicles"],
+        instance["orders"],
+        instance["depot_location"],
+        n_chains=args.chains,
+        max_iterations=args.iterations,
+        workers=args.workers,
+        repeats=args.repeats,
+        polish=None if args.no_polish else annealing.polish,
+    )
+    for record in records:
+        print(
+            f"{record['backend']:<10} {record['elapsed']:8.2f} s"
+            f"  speedup {record['speedup']:5.2f}x  best {record['best_score']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import pickle
+import time
+
+import numpy as np
+
+from annealing import simulated_annealing
+from instrumentation import COUNTERS
+
+CHECKPOINT_VERSION = 1
+
+
+# Compact route encoding: one flat array of order ids plus per-route lengths
+def encode_routes(routes):
+    ids = np.array([order["id"] for route in routes for order in route])
+    lengths = np.array([len(route) for route in routes], dtype=np.int32)
+    return ids, lengths
+
+
+# Rebuild routes of order dicts from encode_routes output
+def decode_routes(encoded, orders):
+    ids, lengths = encoded
+    order_by_id = {order["id"]: order for order in orders}
+    routes, start = [], 0
+    for length in lengths.tolist():
+        routes.append([order_by_id[i] for i in ids[start : start + length].tolist()])
+        start += length
+    return routes
+
+
+# Write bytes atomically: readers see either the old file or the new one
+def atomic_write(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Periodically persists annealing state. Pass as simulated_annealing(checkpointer=...);
+# the loop calls due() once per iteration and save() at most every interval seconds,
+# plus once when the run finishes.
+class Checkpointer:
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        self._next_save = time.monotonic() + interval
+
+    def due(self):
+        return time.monotonic() >= self._next_save
+
+    def save(self, state):
+        stats = state["stats"]
+        payload = {
+            "version": CHECKPOINT_VERSION,
+            "iteration": state["iteration"],
+            "temperature": state["temperature"],
+            "current_solution": encode_routes(state["current_solution"]),
+            "best_solution": encode_routes(state["best_solution"]),
+            "best_score": state["best_score"],
+            "rng_state": state["rng_state"],
+            "stats": None
+            if stats is None
+            else {
+                "operators": stats.operators,
+                "timings": stats.timings,
+                "trajectory": stats.trajectory,
+            },
+            "penalty": state["penalty"],
+            "params": state["params"],
+        }
+        atomic_write(self.path, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        self.saves += 1
+        self._next_save = time.monotonic() + self.interval
+
+
+# Load a checkpoint and decode its routes against the instance's orders.
+# Checkpoints are pickles: only load files you wrote yourself.
+def load_checkpoint(path, orders):
+    with open(path, "rb") as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+    checkpoint["current_solution"] = decode_routes(checkpoint["current_solution"], orders)
+    checkpoint["best_solution"] = decode_routes(checkpoint["best_solution"], orders)
+    return checkpoint
+
+
+# Continue a checkpointed run. Annealing parameters come from the checkpoint;
+# the instance must be the same one the run started with. Keeps checkpointing
+# to the same file unless another checkpointer is given.
+def resume_annealing(
+    path,
+    vehicles,
+    orders,
+    depot_location,
+    checkpoint_interval=5.0,
+    checkpointer=None,
+    stats=None,
+    **kwargs,
+):
+    checkpoint = load_checkpoint(path, orders)
+    if stats is not None and checkpoint["stats"] is not None:
+        stats.operators = checkpoint["stats"]["operators"]
+        # Checkpoints from before a counter existed resume it from zero
+        for counters in stats.operators.values():
+            for counter in COUNTERS:
+                counters.setdefault(counter, 0)
+        stats.timings = checkpoint["stats"]["timings"]
+        stats.trajectory = checkpoint["stats"]["trajectory"]
+    if checkpointer is None:
+        checkpointer = Checkpointer(path, checkpoint_interval)
+
+    params = checkpoint["params"]
+    return simulated_annealing(
+        vehicles,
+        orders,
+        depot_location,
+        params["initial_temp"],
+        params["cooling_rate"],
+        params["max_iterations"],
+        params["weight_distance"],
+        params["weight_time"],
+        stats=stats,
+        checkpointer=checkpointer,
+        resume=checkpoint,
+        **kwargs,
+    )
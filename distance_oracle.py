@@ -0,0 +1,233 @@
+import copy
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
+
+from annealing import (
+    AVERAGE_SPEED,
+    haversine_distance,
+    haversine_vector,
+    summaries_score,
+)
+
+
+# k nearest orders of every order as CSR arrays (indptr, indices, data) over
+# nodes 0..n, node 0 being the depot with an empty row. Columns are sorted
+# within a row. Candidates are ranked a block of rows at a time, so building
+# needs O(block_elements) scratch memory and the result is O(n * k).
+def knn_csr(lats, lngs, k, block_elements=1 << 22):
+    n = len(lats) - 1
+    indices = np.empty((n, k), dtype=np.int64)
+    data = np.empty((n, k))
+    # The distance grows with the haversine "a" term. Expanding its sin^2 terms
+    # (same terms as haversine_vector) with the angle-difference identity gives
+    # a = 1/2 - sources @ targets.T, so a block is ranked by one matrix product.
+    lat_r, lng_r = np.radians(lats[1:]), np.radians(lngs[1:])
+    cos_lat, sin_lat = np.cos(lat_r), np.sin(lat_r)
+    sources = 0.5 * np.column_stack(
+        (sin_lat, cos_lat * np.cos(lng_r), cos_lat * np.sin(lng_r))
+    )
+    targets = np.column_stack((sin_lat, cos_lat**2, cos_lat * sin_lat))
+    block_size = max(1, block_elements // max(n, 1))
+    for start in range(0, n if k else 0, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        closeness = sources[rows] @ targets.T
+        closeness[np.arange(len(rows)), rows] = -np.inf  # no self loops
+        nearest = np.argpartition(closeness, n - k, axis=1)[:, n - k :]
+        nearest = np.sort(nearest, axis=1) + 1
+        indices[rows] = nearest
+        data[rows] = haversine_vector(
+            lats[rows + 1, None], lngs[rows + 1, None], lats[nearest], lngs[nearest]
+        )
+    if k == 0:
+        return np.zeros(n + 2, dtype=np.int64), indices.ravel(), data.ravel()
+    indptr = np.concatenate(([0], np.arange(0, n * k + 1, k)))
+    return indptr, indices.ravel(), data.ravel()
+
+
+# Copy of a stdlib float array with every value multiplied by factor
+def scaled_array(values, factor):
+    return array("d", (np.frombuffer(values) * factor).tobytes())
+
+
+# Read-only view of one oracle row, so oracle[i][j] indexes like a dense matrix
+class _Row:
+    __slots__ = ("oracle", "node")
+
+    def __init__(self, oracle, node):
+        self.oracle = oracle
+        self.node = node
+
+    def __getitem__(self, other):
+        return self.oracle.distance(self.node, other)
+
+
+# Distance oracle in memory linear in the number of orders, for instances where
+# a dense distance_matrix does not fit (100k orders would need 80 GB).
+# Nodes are numbered like distance_matrix: 0 is the depot, i + 1 is orders[i].
+# Each order keeps the distances to its k nearest orders in CSR arrays and both
+# depot legs are stored densely; any other pair is computed on demand and kept
+# in a small LRU cache. Whole routes are priced with one vectorized haversine.
+class DistanceOracle:
+    def __init__(self, orders, depot_location, k=16, cache_size=65536):
+        self.orders = list(orders)
+        self.depot_location = depot_location
+        self.k = min(k, max(len(self.orders) - 1, 0))
+        self.cache_size = cache_size
+        self.node_of = {order["id"]: i for i, order in enumerate(self.orders, 1)}
+
+        self.lats = np.array(
+            [depot_location["lat"]] + [o["location"]["lat"] for o in self.orders]
+        )
+        self.lngs = np.array(
+            [depot_location["lng"]] + [o["location"]["lng"] for o in self.orders]
+        )
+        from_depot = haversine_vector(self.lats[0], self.lngs[0], self.lats, self.lngs)
+        to_depot = haversine_vector(self.lats, self.lngs, self.lats[0], self.lngs[0])
+        indptr, indices, data = knn_csr(self.lats, self.lngs, self.k)
+
+        # Compact stdlib arrays make scalar lookups cheap from Python
+        self._lat, self._lng = array("d", self.lats), array("d", self.lngs)
+        self._from_depot, self._to_depot = array("d", from_depot), array("d", to_depot)
+        self._indptr = array("q", indptr)
+        self._indices = array("q", indices)
+        self._data = array("d", data)
+        self._rows = [_Row(self, node) for node in range(len(self.orders) + 1)]
+        self._cache = OrderedDict()
+        self.leg_weight = 1.0
+        self.sparse_hits = 0
+        self.cache_hits = 0
+        self.computed = 0
+
+    # Cheap variant of the oracle sharing its kNN arrays. orders replaces order
+    # dicts by id (e.g. with scaled volumes; locations must not change) and
+    # depot_location moves the depot, recomputing only the depot legs. The
+    # fallback cache starts empty.
+    def overlay(self, orders=None, depot_location=None):
+        oracle = copy.copy(self)
+        if orders is not None:
+            replaced = {order["id"]: order for order in orders}
+            oracle.orders = [replaced.get(order["id"], order) for order in self.orders]
+        if depot_location is not None:
+            oracle.depot_location = depot_location
+            oracle.lats, oracle.lngs = self.lats.copy(), self.lngs.copy()
+            oracle.lats[0] = depot_location["lat"]
+            oracle.lngs[0] = depot_location["lng"]
+            from_depot = haversine_vector(
+                oracle.lats[0], oracle.lngs[0], oracle.lats, oracle.lngs
+            )
+            to_depot = haversine_vector(
+                oracle.lats, oracle.lngs, oracle.lats[0], oracle.lngs[0]
+            )
+            oracle._lat, oracle._lng = array("d", oracle.lats), array("d", oracle.lngs)
+            oracle._from_depot = array("d", from_depot)
+            oracle._to_depot = array("d", to_depot)
+        oracle._rows = [_Row(oracle, node) for node in range(len(self._rows))]
+        oracle._cache = OrderedDict()
+        oracle.sparse_hits = oracle.cache_hits = oracle.computed = 0
+        return oracle
+
+    # Copy of the oracle whose lookups return leg costs instead of distances:
+    # legs into the depot are multiplied by return_weight and all other legs by
+    # leg_weight. Only oracle[i][j] and distance() are scaled; the vectorized
+    # route methods still return distances.
+    def scaled(self, leg_weight, return_weight):
+        oracle = self.overlay()
+        oracle._from_depot = scaled_array(self._from_depot, leg_weight)
+        oracle._to_depot = scaled_array(self._to_depot, return_weight)
+        oracle._data = scaled_array(self._data, leg_weight)
+        oracle.leg_weight = self.leg_weight * leg_weight
+        return oracle
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, node):
+        return self._rows[node]
+
+    # Distance from node i to node j (not symmetric, like haversine_distance)
+    def distance(self, i, j):
+        if i == 0:
+            return self._from_depot[j]
+        if j == 0:
+            return self._to_depot[i]
+
+        start, stop = self._indptr[i], self._indptr[i + 1]
+        p = bisect_left(self._indices, j, start, stop)
+        if p < stop and self._indices[p] == j:
+            self.sparse_hits += 1
+            return self._data[p]
+
+        key = (i, j)
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return value
+
+        self.computed += 1
+        value = haversine_distance(self._lat[i], self._lng[i], self._lat[j], self._lng[j])
+        value *= self.leg_weight
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    # Vectorized distances for arrays of node pairs, computed directly
+    def distances(self, sources, targets):
+        sources, targets = np.asarray(sources), np.asarray(targets)
+        return haversine_vector(
+            self.lats[sources], self.lngs[sources], self.lats[targets], self.lngs[targets]
+        )
+
+    # The up to k nearest orders of an order node, closest first
+    def neighbors(self, node, k=None):
+        start, stop = self._indptr[node], self._indptr[node + 1]
+        closest = sorted(range(start, stop), key=self._data.__getitem__)[:k]
+        return [self._indices[p] for p in closest]
+
+    # Neighbor lists for every node, as local_search.neighbor_lists returns them
+    def neighbor_lists(self, k):
+        return [[]] + [self.neighbors(node, k) for node in range(1, len(self))]
+
+    # Leg distances of a route: depot -> orders -> depot
+    def legs(self, route):
+        nodes = [0] + [self.node_of[order["id"]] for order in route] + [0]
+        return self.distances(nodes[:-1], nodes[1:])
+
+    # Same (distance, time, weight, volume) summary as annealing.route_summary
+    def route_summary(self, route):
+        legs = self.legs(route)
+        route_dist = float(legs.sum())
+        route_time = float(legs[:-1].sum()) / AVERAGE_SPEED
+        route_weight = 0
+        route_volume = 0
+        for order in route:
+            route_weight += order["weight"]
+            route_volume += order["volume"]
+        return route_dist, route_time, route_weight, route_volume
+
+    # Same weighted score as annealing.total_distance
+    def total_distance(self, routes, weight_distance, weight_time):
+        summaries = [self.route_summary(route) for route in routes]
+        return summaries_score(summaries, weight_distance, weight_time)
+
+    # Memory held by the oracle's arrays, in bytes
+    def nbytes(self):
+        arrays = (self._lat, self._lng, self._from_depot, self._to_depot)
+        arrays += (self._indptr, self._indices, self._data)
+        stored = sum(a.itemsize * len(a) for a in arrays)
+        return stored + self.lats.nbytes + self.lngs.nbytes
+
+    def stats(self):
+        return {
+            "orders": len(self.orders),
+            "k": self.k,
+            "sparse_hits": self.sparse_hits,
+            "cache_hits": self.cache_hits,
+            "computed": self.computed,
+            "cache_size": len(self._cache),
+            "nbytes": self.nbytes(),
+        }
@@ -0,0 +1,178 @@
+import math
+from collections import deque
+
+from annealing import distance_matrix, make_rng, score_per_km, total_distance
+from spatial import spatially_sorted
+
+GIANT_TOUR_MOVES = ["swap", "relocate", "2-opt"]
+
+
+# Optimal Split of a giant tour into capacity-feasible routes (Prins), for a
+# limited, possibly heterogeneous fleet: route k is driven by vehicles[k].
+# One DP layer per vehicle, each solved in linear time with Vidal's monotone
+# deque, since the cost of route tour[i:j] separates into f(i) + g(j) and the
+# capacity window over i only moves forward as j grows.
+# tour holds distance-matrix node ids (order index + 1). Returns the weighted
+# cost and the routes as lists of node ids, or (math.inf, None) if the fleet
+# cannot carry the tour in this order.
+def split(tour, dist, weights, volumes, vehicles, weight_distance, weight_time):
+    n = len(tour)
+    leg_weight = score_per_km(weight_distance, weight_time)
+
+    # Prefix sums over tour positions 1..n: distance along the tour and loads
+    along = [0.0] * (n + 1)
+    load_weight = [0.0] * (n + 1)
+    load_volume = [0.0] * (n + 1)
+    for t in range(1, n + 1):
+        node = tour[t - 1]
+        if t > 1:
+            along[t] = along[t - 1] + dist[tour[t - 2]][node]
+        load_weight[t] = load_weight[t - 1] + weights[node]
+        load_volume[t] = load_volume[t - 1] + volumes[node]
+
+    # An unused vehicle still pays its depot -> depot leg, as in total_distance
+    empty_route = weight_distance * dist[0][0]
+
+    previous = [0.0] + [math.inf] * n
+    layers = []
+    for vehicle in vehicles:
+        capacity_weight = vehicle["capacity_weight"]
+        capacity_volume = vehicle["capacity_volume"]
+        current = [p + empty_route for p in previous]
+        predecessor = [-1] * (n + 1)
+
+        # f(i): cost of everything before a route that starts at tour position i + 1
+        def f(i):
+            return previous[i] + leg_weight * (dist[0][tour[i]] - along[i + 1])
+
+        candidates = deque()
+        start = 0
+        for j in range(1, n + 1):
+            i = j - 1
+            if previous[i] < math.inf:
+                value = f(i)
+                while candidates and candidates[-1][1] >= value:
+                    candidates.pop()
+                candidates.append((i, value))
+            while (
+                load_weight[j] - load_weight[start] > capacity_weight
+                or load_volume[j] - load_volume[start] > capacity_volume
+            ):
+                start += 1
+            while candidates and candidates[0][0] < start:
+                candidates.popleft()
+            if candidates:
+                i, value = candidates[0]
+                cost = (
+                    value
+                    + leg_weight * along[j]
+                    + weight_distance * dist[tour[j - 1]][0]
+                )
+                if cost < current[j]:
+                    current[j] = cost
+                    predecessor[j] = i
+
+        layers.append(predecessor)
+        previous = current
+
+    if previous[n] == math.inf:
+        return math.inf, None
+
+    # Walk the layers backwards to recover one route per vehicle
+    routes = []
+    j = n
+    for predecessor in reversed(layers):
+        i = predecessor[j]
+        if i < 0:
+            routes.append([])
+        else:
+            routes.append(tour[i:j])
+            j = i
+    routes.reverse()
+    return previous[n], routes
+
+
+# Permutation moves on a giant tour; none of them can break capacity because
+# Split decides where routes start and end
+def giant_tour_neighbor(tour, rng):
+    new_tour = list(tour)
+    if len(new_tour) < 2:
+        return new_tour  # Nothing to permute
+    i, j = rng.choice(len(new_tour), 2, replace=False).tolist()
+    move_type = GIANT_TOUR_MOVES[rng.integers(len(GIANT_TOUR_MOVES))]
+    if move_type == "swap":
+        new_tour[i], new_tour[j] = new_tour[j], new_tour[i]
+    elif move_type == "relocate":
+        new_tour.insert(j, new_tour.pop(i))
+    else:
+        i, j = min(i, j), max(i, j)
+        new_tour[i : j + 1] = reversed(new_tour[i : j + 1])
+    return new_tour
+
+
+# Simulated annealing over giant tours decoded by Split. Every decodable
+# neighbor is feasible, so no proposals are lost to capacity checks; until the
+# first decodable tour is found the search walks freely. With a distance oracle,
+# Split reads legs from it and tours use its node numbering.
+def giant_tour_annealing(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_distance,
+    weight_time,
+    rng=None,
+    curve="hilbert",
+    oracle=None,
+):
+    rng = make_rng(rng)
+    if oracle is not None:
+        orders, dist = oracle.orders, oracle
+    else:
+        # Renumber orders along a space-filling curve before building the matrix
+        orders = spatially_sorted(orders, curve)
+        dist = distance_matrix(orders, depot_location)
+    weights = [0.0] + [order["weight"] for order in orders]
+    volumes = [0.0] + [order["volume"] for order in orders]
+
+    def decode(tour):
+        return split(
+            tour, dist, weights, volumes, vehicles, weight_distance, weight_time
+        )
+
+    current_tour = (rng.permutation(len(orders)) + 1).tolist()
+    current_score, current_routes = decode(current_tour)
+    best_routes, best_score = current_routes, current_score
+
+    temperature = initial_temp
+    for _ in range(max_iterations):
+        if temperature <= 0:
+            break
+
+        new_tour = giant_tour_neighbor(current_tour, rng)
+        new_score, new_routes = decode(new_tour)
+
+        if current_routes is None or (
+            new_routes is not None
+            and (
+                new_score < current_score
+                or rng.random() < math.exp((current_score - new_score) / temperature)
+            )
+        ):
+            current_tour, current_routes, current_score = new_tour, new_routes, new_score
+
+        if current_score < best_score:
+            best_routes, best_score = current_routes, current_score
+
+        temperature *= cooling_rate
+
+    if best_routes is None:
+        raise ValueError("No capacity-feasible split found for this fleet")
+
+    best_solution = [[orders[node - 1] for node in route] for route in best_routes]
+    best_score, _, _ = total_distance(
+        best_solution, depot_location, weight_distance, weight_time, oracle
+    )
+    return best_solution, best_score
@@ -0,0 +1,131 @@
+import csv
+import json
+import time
+
+from annealing import MOVE_TYPES
+
+PHASES = ["move", "validity", "scoring"]
+COUNTERS = ["proposals", "invalid", "tabu_skipped", "accepted", "improved"]
+COUNTER_HELP = {
+    "proposals": "Moves proposed per operator",
+    "invalid": "Moves rejected as infeasible per operator",
+    "tabu_skipped": "Moves skipped unevaluated as tabu per operator",
+    "accepted": "Moves accepted per operator",
+    "improved": "Moves that improved the current score per operator",
+}
+
+
+# Counters, phase timings and a sampled trajectory for one annealing run.
+# Pass an instance as simulated_annealing(stats=...); the loop only pays for
+# a few perf_counter calls per iteration and a sample every trajectory_stride.
+class AnnealingStats:
+    def __init__(self, trajectory_stride=100):
+        self.trajectory_stride = trajectory_stride
+        self.operators = {
+            move_type: dict.fromkeys(COUNTERS, 0) for move_type in MOVE_TYPES
+        }
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        # (iteration, temperature, current score, best score)
+        self.trajectory = []
+        self.started_at = time.time()
+
+    def record_move(
+        self,
+        move_type,
+        move_time,
+        validity_time,
+        scoring_time,
+        valid=True,
+        accepted=False,
+        improved=False,
+        tabu_skipped=False,
+    ):
+        counters = self.operators[move_type]
+        counters["proposals"] += 1
+        if not valid:
+            counters["invalid"] += 1
+        if tabu_skipped:
+            counters["tabu_skipped"] += 1
+        if accepted:
+            counters["accepted"] += 1
+        if improved:
+            counters["improved"] += 1
+        self.timings["move"] += move_time
+        self.timings["validity"] += validity_time
+        self.timings["scoring"] += scoring_time
+
+    def sample(self, iteration, temperature, current_score, best_score):
+        self.trajectory.append((iteration, temperature, current_score, best_score))
+
+    def totals(self):
+        return {
+            counter: sum(counters[counter] for counters in self.operators.values())
+            for counter in COUNTERS
+        }
+
+    def to_dict(self):
+        return {
+            "operators": self.operators,
+            "totals": self.totals(),
+            "timings": self.timings,
+            "elapsed": time.time() - self.started_at,
+            "trajectory": [
+                {
+                    "iteration": iteration,
+                    "temperature": temperature,
+                    "current_score": current_score,
+                    "best_score": best_score,
+                }
+                for iteration, temperature, current_score, best_score in self.trajectory
+            ],
+        }
+
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    # Trajectory as CSV, one row per sample
+    def write_trajectory_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["iteration", "temperature", "current_score", "best_score"])
+            writer.writerows(self.trajectory)
+
+    # Per-operator counters as CSV, one row per move type
+    def write_operators_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["operator"] + COUNTERS)
+            for move_type, counters in self.operators.items():
+                writer.writerow([move_type] + [counters[c] for c in COUNTERS])
+
+    # Prometheus text exposition format
+    def to_prometheus(self, prefix="annealing"):
+        lines = []
+        for counter in COUNTERS:
+            name = f"{prefix}_{counter}_total"
+            lines.append(f"# HELP {name} {COUNTER_HELP[counter]}")
+            lines.append(f"# TYPE {name} counter")
+            for move_type, counters in self.operators.items():
+                lines.append(f'{name}{{operator="{move_type}"}} {counters[counter]}')
+
+        name = f"{prefix}_phase_seconds_total"
+        lines.append(f"# HELP {name} Time spent per loop phase")
+        lines.append(f"# TYPE {name} counter")
+        for phase, seconds in self.timings.items():
+            lines.append(f'{name}{{phase="{phase}"}} {seconds}')
+
+        if self.trajectory:
+            iteration, temperature, current_score, best_score = self.trajectory[-1]
+            for gauge, value in (
+                ("iteration", iteration),
+                ("temperature", temperature),
+                ("current_score", current_score),
+                ("best_score", best_score),
+            ):
+                lines.append(f"# TYPE {prefix}_{gauge} gauge")
+                lines.append(f"{prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,432 @@
+import argparse
+import json
+import math
+import multiprocessing
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+import annealing
+from annealing import polish_solution, simulated_annealing
+from chains import PER_CHAIN_PLUGINS, chain_kwargs, chain_seeds
+
+TOPOLOGIES = ["ring", "complete", "star"]
+
+# Header of a migrant message: epoch, source node, score, route count, stop count
+MIGRANT_HEADER = struct.Struct("<iidII")
+FRAME_HEADER = struct.Struct("!I")
+FINAL_EPOCH = -1
+
+
+# Nodes a node sends its best solution to after every epoch.
+# ring: the next node; complete: every other node; star: node 0 and all others.
+def migration_targets(node, n_nodes, topology):
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology: {topology}")
+    if topology == "ring":
+        return [(node + 1) % n_nodes] if n_nodes > 1 else []
+    if topology == "complete" or node == 0:
+        return [other for other in range(n_nodes) if other != node]
+    return [0]
+
+
+# Nodes a node receives migrants from
+def migration_sources(node, n_nodes, topology):
+    return [
+        other
+        for other in range(n_nodes)
+        if node in migration_targets(other, n_nodes, topology)
+    ]
+
+
+# Compact binary migrant: a fixed header, then route lengths and the orders'
+# positions in the instance's order list, both as little-endian int32. Every
+# node holds the same instance, so positions are enough to rebuild the routes.
+def pack_migrant(epoch, source, score, routes, index_of):
+    lengths = np.array([len(route) for route in routes], dtype="<i4")
+    stops = np.array(
+        [index_of[order["id"]] for route in routes for order in route], dtype="<i4"
+    )
+    header = MIGRANT_HEADER.pack(epoch, source, score, len(lengths), len(stops))
+    return header + lengths.tobytes() + stops.tobytes()
+
+
+# Inverse of pack_migrant: (epoch, source, score, routes)
+def unpack_migrant(payload, orders):
+    epoch, source, score, n_routes, n_stops = MIGRANT_HEADER.unpack_from(payload)
+    offset = MIGRANT_HEADER.size
+    lengths = np.frombuffer(payload, dtype="<i4", count=n_routes, offset=offset)
+    offset += 4 * n_routes
+    stops = np.frombuffer(payload, dtype="<i4", count=n_stops, offset=offset).tolist()
+    routes, start = [], 0
+    for length in lengths.tolist():
+        routes.append([orders[k] for k in stops[start : start + length]])
+        start += length
+    return epoch, source, score, routes
+
+
+# Local stand-in transport: one multiprocessing queue per node
+class QueueTransport:
+    def __init__(self, node, inboxes):
+        self.node = node
+        self.inboxes = inboxes
+
+    def send(self, target, payload):
+        self.inboxes[target].put(payload)
+
+    def receive(self, timeout=None):
+        return self.inboxes[self.node].get(timeout=timeout)
+
+    def close(self):
+        pass
+
+
+# TCP transport between machines. Every node listens on its own "host:port" from
+# addresses; each message is one length-prefixed frame on a short connection,
+# which is plenty for a migration every few seconds.
+class TcpTransport:
+    def __init__(self, node, addresses, connect_timeout=30.0):
+        self.node = node
+        self.addresses = [parse_address(address) for address in addresses]
+        self.connect_timeout = connect_timeout
+        self.inbox = queue.Queue()
+        inbox = self.inbox
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                stream = self.request.makefile("rb")
+                (size,) = FRAME_HEADER.unpack(stream.read(FRAME_HEADER.size))
+                inbox.put(stream.read(size))
+
+        host, port = self.addresses[node]
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, target, payload):
+        # Peers may still be starting up, so retry until connect_timeout
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                with socket.create_connection(self.addresses[target], timeout=10) as conn:
+                    conn.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def receive(self, timeout=None):
+        return self.inbox.get(timeout=timeout)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+# Checkpointer that never fires during the run and keeps the final state,
+# which lets the next epoch resume the island exactly where it stopped
+class LastState:
+    def __init__(self):
+        self.state = None
+
+    def due(self):
+        return False
+
+    def save(self, state):
+        self.state = state
+
+
+# Advance one island until iteration stop; returns its resumable state and its
+# stateful plug-ins, which a worker process must hand back to persist them
+def run_epoch(seed, state, stop, args, kwargs):
+    vehicles, orders, depot_location, initial_temp, cooling_rate = args[:5]
+    weight_distance, weight_time = args[6:]
+    last_state = LastState()
+    simulated_annealing(
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        stop,
+        weight_distance,
+        weight_time,
+        rng=seed,
+        resume=state,
+        checkpointer=last_state,
+        **kwargs,
+    )
+    plugins = {
+        name: kwargs[name] for name in PER_CHAIN_PLUGINS if kwargs.get(name) is not None
+    }
+    return last_state.state, plugins
+
+
+# Collect this epoch's migrants from every source node. Messages that arrive
+# early for a later epoch wait in pending.
+def receive_migrants(transport, epoch, sources, pending, orders, timeout):
+    while not all((epoch, source) in pending for source in sources):
+        message_epoch, source, score, routes = unpack_migrant(
+            transport.receive(timeout), orders
+        )
+        pending[(message_epoch, source)] = (score, routes)
+    return [pending.pop((epoch, source)) for source in sources]
+
+
+# Run one node of the island model: its chains anneal in epochs of
+# migration_interval iterations; after each epoch the node sends its best
+# solution to its topology targets and waits for its sources' migrants. The best
+# migrant replaces the current solution of the node's worst island if it beats
+# that island's best. Migration is synchronous and each chain keeps its own
+# plug-ins, so a run reproduces exactly for any worker count.
+# At the end all nodes report to node 0, which returns the overall best solution
+# and score and the best score of each node; other nodes return their own best
+# and None.
+def run_node(
+    node,
+    n_nodes,
+    transport,
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_distance,
+    weight_time,
+    chains_per_node=2,
+    migration_interval=1000,
+    topology="ring",
+    master_seed=42,
+    workers=1,
+    timeout=600.0,
+    polish=None,
+    **kwargs,
+):
+    args = (
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        max_iterations,
+        weight_distance,
+        weight_time,
+    )
+    seeds = chain_seeds(master_seed, n_nodes * chains_per_node)
+    seeds = seeds[node * chains_per_node : (node + 1) * chains_per_node]
+    index_of = {order["id"]: k for k, order in enumerate(orders)}
+    targets = migration_targets(node, n_nodes, topology)
+    sources = migration_sources(node, n_nodes, topology)
+    epochs = max(1, math.ceil(max_iterations / migration_interval))
+
+    # Each chain owns its plug-ins for the whole run, whatever the worker count
+    per_chain = [chain_kwargs(kwargs) for _ in seeds]
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    states = [None] * chains_per_node
+    pending = {}
+    try:
+        for epoch in range(epochs):
+            stop = min((epoch + 1) * migration_interval, max_iterations)
+            if pool is None:
+                results = [
+                    run_epoch(seed, state, stop, args, own)
+                    for seed, state, own in zip(seeds, states, per_chain)
+                ]
+            else:
+                results = list(
+                    pool.map(run_epoch, seeds, states, repeat(stop), repeat(args), per_chain)
+                )
+            states = [state for state, _ in results]
+            for own, (_, plugins) in zip(per_chain, results):
+                own.update(plugins)
+            if epoch == epochs - 1:
+                break
+
+            best = min(states, key=lambda state: state["best_score"])
+            payload = pack_migrant(
+                epoch, node, best["best_score"], best["best_solution"], index_of
+            )
+            for target in targets:
+                transport.send(target, payload)
+
+            migrants = receive_migrants(
+                transport, epoch, sources, pending, orders, timeout
+            )
+            if migrants:
+                score, routes = min(migrants, key=lambda migrant: migrant[0])
+                worst = max(states, key=lambda state: state["best_score"])
+                if score < worst["best_score"]:
+                    worst["current_solution"] = routes
+                    worst["best_solution"] = routes
+                    worst["best_score"] = score
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    best = min(states, key=lambda state: state["best_score"])
+    best_solution, best_score = best["best_solution"], best["best_score"]
+    if node != 0:
+        transport.send(
+            0, pack_migrant(FINAL_EPOCH, node, best_score, best_solution, index_of)
+        )
+        return best_solution, best_score, None
+
+    finals = receive_migrants(
+        transport, FINAL_EPOCH, range(1, n_nodes), pending, orders, timeout
+    )
+    node_scores = [best_score] + [score for score, _ in finals]
+    # Ties go to the lowest node index, keeping the choice deterministic
+    for score, routes in finals:
+        if score < best_score:
+            best_solution, best_score = routes, score
+
+    best_solution, best_score = polish_solution(
+        best_solution,
+        best_score,
+        vehicles,
+        depot_location,
+        weight_distance,
+        weight_time,
+        polish,
+        kwargs.get("oracle"),
+    )
+    return best_solution, best_score, node_scores
+
+
+def run_local_node(node, n_nodes, inboxes, results, args, kwargs):
+    transport = QueueTransport(node, inboxes)
+    results.put((node, run_node(node, n_nodes, transport, *args, **kwargs)))
+
+
+# Island model on this machine: every node is a process and migrants travel over
+# multiprocessing queues. Returns the best solution, its score and each node's
+# best score.
+def island_annealing(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_distance,
+    weight_time,
+    n_nodes=4,
+    **kwargs,
+):
+    args = (
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        max_iterations,
+        weight_distance,
+        weight_time,
+    )
+    inboxes = [multiprocessing.Queue() for _ in range(n_nodes)]
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=run_local_node,
+            args=(node, n_nodes, inboxes, results, args, kwargs),
+        )
+        for node in range(n_nodes)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return outcomes[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run one node of a distributed island-model annealing."
+    )
+    parser.add_argument(
+        "instance", help="JSON file with vehicles, orders and depot_location"
+    )
+    parser.add_argument("--node", type=int, required=True, help="this node's index")
+    parser.add_argument(
+        "--peers",
+        required=True,
+        help="comma-separated host:port of every node, in node order",
+    )
+    parser.add_argument("--chains", type=int, default=2, help="chains on this node")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--migration-interval", type=int, default=1000)
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument("--seed", type=int, default=annealing.seed)
+    parser.add_argument("--initial-temp", type=float, default=annealing.initial_temp)
+    parser.add_argument("--cooling-rate", type=float, default=annealing.cooling_rate)
+    parser.add_argument("--iterations", type=int, default=annealing.max_iterations)
+    parser.add_argument(
+        "--polish", choices=["none", "first", "best"], default=annealing.polish or "none"
+    )
+    parser.add_argument(
+        "-o", "--output", help="result file on node 0 (.json, .csv, .arrow, .parquet)"
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.instance) as f:
+        instance = json.load(f)
+    peers = args.peers.split(",")
+    transport = TcpTransport(args.node, peers)
+    try:
+        best_solution, best_score, node_scores = run_node(
+            args.node,
+            len(peers),
+            transport,
+            instance["vehicles"],
+            instance["orders"],
+            instance["depot_location"],
+            args.initial_temp,
+            args.cooling_rate,
+            args.iterations,
+            annealing.weight_distance,
+            annealing.weight_time,
+            chains_per_node=args.chains,
+            migration_interval=args.migration_interval,
+            topology=args.topology,
+            master_seed=args.seed,
+            workers=args.workers,
+            polish=None if args.polish == "none" else args.polish,
+        )
+    finally:
+        transport.close()
+
+    if args.node != 0:
+        return
+    if args.output:
+        from results import write_solution
+
+        write_solution(
+            args.output,
+            best_solution,
+            instance["vehicles"],
+            instance["depot_location"],
+            best_score,
+        )
+    json.dump({"best_score": best_score, "node_scores": node_scores}, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+from annealing import score_per_km, total_distance
+from distance_oracle import DistanceOracle
+from spatial import curve_order
+
+# Moves smaller than this are treated as no improvement (guards against float noise)
+EPSILON = 1e-9
+
+
+# Indices of the k closest other orders for every order node (node 0 is the depot)
+def neighbor_lists(dist, k):
+    nodes = range(1, len(dist))
+    neighbors = [[]]
+    for u in nodes:
+        row = dist[u]
+        closest = heapq.nsmallest(
+            k, (v for v in nodes if v != u), key=row.__getitem__
+        )
+        neighbors.append(closest)
+    return neighbors
+
+
+# Leg costs memoized by (from, to) node pair: a hit is one dict lookup instead
+# of a trip through the oracle. The memo is cleared when it outgrows max_size,
+# which bounds its memory on large instances.
+class LegCosts(dict):
+    def __init__(self, oracle, max_size=1 << 18):
+        super().__init__()
+        self.oracle = oracle
+        self.max_size = max_size
+
+    def __missing__(self, key):
+        if len(self) >= self.max_size:
+            self.clear()
+        value = self[key] = self.oracle.distance(*key)
+        return value
+
+
+# Prefix sums of leg costs along a tour, read forwards and backwards.
+# Used to price 2-opt reversals in O(1) even when distances are asymmetric.
+# Legs inside a tour never end at the depot, so all cost leg_weight per km and
+# the oracle prices them in one vectorized call per direction.
+def tour_prefix_sums(tour, oracle, leg_weight):
+    if len(tour) < 2:
+        return [0.0] * max(len(tour), 1), [0.0] * max(len(tour), 1)
+    forward = oracle.distances(tour[:-1], tour[1:]) * leg_weight
+    backward = oracle.distances(tour[1:], tour[:-1]) * leg_weight
+    return (
+        [0.0] + np.cumsum(forward).tolist(),
+        [0.0] + np.cumsum(backward).tolist(),
+    )
+
+
+# Candidate improving moves for node u, yielded as (delta, move) pairs
+def candidate_moves(u, state):
+    cost, tours = state["cost"], state["tours"]
+    route_of, pos_of = state["route_of"], state["pos_of"]
+    ru, pu = route_of[u], pos_of[u]
+    tour_u = tours[ru]
+    a_u = tour_u[pu - 1] if pu > 0 else 0
+    b_u = tour_u[pu + 1] if pu + 1 < len(tour_u) else 0
+    removal = cost[a_u, b_u] - cost[a_u, u] - cost[u, b_u]
+
+    for v in state["neighbors"][u]:
+        rv, pv = route_of[v], pos_of[v]
+        tour_v = tours[rv]
+        a_v = tour_v[pv - 1] if pv > 0 else 0
+        b_v = tour_v[pv + 1] if pv + 1 < len(tour_v) else 0
+        fits = rv == ru or fits_route(state, rv, add=u)
+
+        # Relocate u directly after v, or directly before v
+        if fits and not (rv == ru and pv == pu - 1):
+            delta = removal + cost[v, u] + cost[u, b_v] - cost[v, b_v]
+            yield delta, ("relocate", u, rv, pv + 1)
+        if fits and not (rv == ru and pv == pu + 1):
+            delta = removal + cost[a_v, u] + cost[u, v] - cost[a_v, v]
+            yield delta, ("relocate", u, rv, pv)
+
+        # Swap u and v
+        if rv != ru:
+            if fits_route(state, ru, add=v, remove=u) and fits_route(
+                state, rv, add=u, remove=v
+            ):
+                delta = (
+                    cost[a_u, v] + cost[v, b_u] - cost[a_u, u] - cost[u, b_u]
+                    + cost[a_v, u] + cost[u, b_v] - cost[a_v, v] - cost[v, b_v]
+                )
+                yield delta, ("swap", u, v)
+        else:
+            if b_u == v:
+                delta = (
+                    cost[a_u, v] + cost[v, u] + cost[u, b_v]
+                    - cost[a_u, u] - cost[u, v] - cost[v, b_v]
+                )
+            elif b_v == u:
+                delta = (
+                    cost[a_v, u] + cost[u, v] + cost[v, b_u]
+                    - cost[a_v, v] - cost[v, u] - cost[u, b_u]
+                )
+            else:
+                delta = (
+                    cost[a_u, v] + cost[v, b_u] - cost[a_u, u] - cost[u, b_u]
+                    + cost[a_v, u] + cost[u, b_v] - cost[a_v, v] - cost[v, b_v]
+                )
+            yield delta, ("swap", u, v)
+
+            # 2-opt: reverse a segment so that u and v become adjacent
+            lo, hi = min(pu, pv), max(pu, pv)
+            for i, j in ((lo + 1, hi), (lo, hi - 1)):
+                if j > i:
+                    yield two_opt_delta(state, ru, i, j), ("2-opt", ru, i, j)
+
+    # Relocate u into an empty route; neighbor lists never point there
+    for r, tour in enumerate(tours):
+        if not tour and r != ru and fits_route(state, r, add=u):
+            yield removal + cost[0, u] + cost[u, 0], ("relocate", u, r, 0)
+
+
+# Cost change of reversing tours[r][i..j] in place
+def two_opt_delta(state, r, i, j):
+    cost, tour = state["cost"], state["tours"][r]
+    forward, backward = state["prefix"][r]
+    a = tour[i - 1] if i > 0 else 0
+    b = tour[j + 1] if j + 1 < len(tour) else 0
+    return (
+        cost[a, tour[j]] + cost[tour[i], b] - cost[a, tour[i]] - cost[tour[j], b]
+        + (backward[j] - backward[i]) - (forward[j] - forward[i])
+    )
+
+
+# Check the capacity of route r after adding and/or removing a node
+def fits_route(state, r, add=None, remove=None):
+    load_weight, load_volume = state["load_weight"][r], state["load_volume"][r]
+    weight, volume = state["weight"], state["volume"]
+    if add is not None:
+        load_weight += weight[add]
+        load_volume += volume[add]
+    if remove is not None:
+        load_weight -= weight[remove]
+        load_volume -= volume[remove]
+    vehicle = state["vehicles"][r]
+    return (
+        load_weight <= vehicle["capacity_weight"]
+        and load_volume <= vehicle["capacity_volume"]
+    )
+
+
+# Refresh positions, loads and prefix sums of a route after it changed
+def reindex_route(state, r):
+    tour = state["tours"][r]
+    for p, u in enumerate(tour):
+        state["route_of"][u] = r
+        state["pos_of"][u] = p
+    state["load_weight"][r] = sum(state["weight"][u] for u in tour)
+    state["load_volume"][r] = sum(state["volume"][u] for u in tour)
+    state["prefix"][r] = tour_prefix_sums(tour, state["dist"], state["leg_weight"])
+
+
+# Nodes at and next to position p of a tour
+def surroundings(tour, p):
+    return tour[max(p - 1, 0) : p + 2]
+
+
+# Apply a move and return the nodes whose surroundings changed
+def apply_move(state, move):
+    tours, route_of, pos_of = state["tours"], state["route_of"], state["pos_of"]
+    if move[0] == "relocate":
+        _, u, target, index = move
+        source, p = route_of[u], pos_of[u]
+        touched = set(surroundings(tours[source], p))
+        tours[source].pop(p)
+        if target == source and index > p:
+            index -= 1
+        tours[target].insert(index, u)
+        changed, moved = {source, target}, [u]
+    elif move[0] == "swap":
+        _, u, v = move
+        ru, pu, rv, pv = route_of[u], pos_of[u], route_of[v], pos_of[v]
+        touched = set(surroundings(tours[ru], pu)) | set(surroundings(tours[rv], pv))
+        tours[ru][pu], tours[rv][pv] = v, u
+        changed, moved = {ru, rv}, [u, v]
+    else:
+        _, r, i, j = move
+        tours[r][i : j + 1] = reversed(tours[r][i : j + 1])
+        touched = set()
+        changed, moved = {r}, [tours[r][i], tours[r][j]]
+
+    for r in changed:
+        reindex_route(state, r)
+    for u in moved:
+        touched.update(surroundings(tours[route_of[u]], pos_of[u]))
+    return touched
+
+
+# Steepest-descent polish with relocate, swap and 2-opt moves.
+# Uses neighbor lists to limit candidates and don't-look bits so nodes whose
+# surroundings did not change are not re-examined. A move can also open moves
+# away from its surroundings (a route's load dropped, a reversal changed 2-opt
+# deltas), so once the queue runs dry every node is re-examined; the search ends
+# after a full sweep that applies no move, i.e. at a local optimum of the
+# neighborhood.
+# Distances and kNN lists come from a sparse DistanceOracle, the caller's if given.
+def local_search(
+    routes,
+    vehicles,
+    depot_location,
+    weight_distance,
+    weight_time,
+    strategy="first",
+    neighbor_count=10,
+    curve="hilbert",
+    oracle=None,
+):
+    if strategy not in ("first", "best"):
+        raise ValueError(f"Unknown local search strategy: {strategy}")
+
+    # Moves are priced in score units: see score_per_km
+    leg_weight = score_per_km(weight_distance, weight_time)
+
+    if oracle is None:
+        # Number nodes along a space-filling curve so nearby orders share cache
+        # lines; a sparse oracle over the routes' orders replaces a dense matrix
+        flat = [order for route in routes for order in route]
+        numbering = curve_order(flat, curve) if curve is not None else range(len(flat))
+        local_oracle = DistanceOracle(
+            [flat[k] for k in numbering], depot_location, k=neighbor_count
+        )
+    else:
+        local_oracle = oracle
+
+    nodes = [None] + local_oracle.orders
+    dist = local_oracle.scaled(leg_weight, weight_distance)
+    tours = [[local_oracle.node_of[order["id"]] for order in route] for route in routes]
+
+    if neighbor_count <= local_oracle.k:
+        neighbors = dist.neighbor_lists(neighbor_count)
+    else:
+        neighbors = neighbor_lists(dist, neighbor_count)
+
+    # An oracle may cover more orders than the routes hold, e.g. in a scenario
+    # that drops orders; nodes outside the routes are never examined
+    present = sorted(node for tour in tours for node in tour)
+    if len(present) < len(nodes) - 1:
+        in_routes = set(present)
+        neighbors = [[v for v in lst if v in in_routes] for lst in neighbors]
+
+    state = {
+        "dist": dist,
+        "cost": LegCosts(dist),
+        "leg_weight": leg_weight,
+        "vehicles": vehicles,
+        "tours": tours,
+        "neighbors": neighbors,
+        "weight": [0] + [order["weight"] for order in nodes[1:]],
+        "volume": [0] + [order["volume"] for order in nodes[1:]],
+        "route_of": [0] * len(nodes),
+        "pos_of": [0] * len(nodes),
+        "load_weight": [0] * len(tours),
+        "load_volume": [0] * len(tours),
+        "prefix": [None] * len(tours),
+    }
+    for r in range(len(tours)):
+        reindex_route(state, r)
+
+    # Don't-look bits: only nodes in the queue are examined
+    active = [False] * len(nodes)
+    moved = True
+    while moved:
+        moved = False
+        queue = deque(present)
+        for u in present:
+            active[u] = True
+
+        while queue:
+            u = queue.popleft()
+            active[u] = False
+
+            best_delta, best_move = -EPSILON, None
+            for delta, move in candidate_moves(u, state):
+                if delta < best_delta:
+                    best_delta, best_move = delta, move
+                    if strategy == "first":
+                        break
+            if best_move is None:
+                continue
+
+            moved = True
+            for w in apply_move(state, best_move):
+                if not active[w]:
+                    active[w] = True
+                    queue.append(w)
+
+    polished = [[nodes[u] for u in tour] for tour in tours]
+    score, _, _ = total_distance(
+        polished, depot_location, weight_distance, weight_time, oracle
+    )
+    return polished, score
@@ -0,0 +1,279 @@
+import math
+
+import numpy as np
+
+from annealing import (
+    AVERAGE_SPEED,
+    generate_neighbor,
+    haversine_distance,
+    make_rng,
+    move_distribution,
+    route_summary,
+    summaries_valid,
+)
+
+OBJECTIVES = ["distance", "time", "vehicles_used", "lateness"]
+
+
+# a weakly dominates b: no worse in every objective (all minimized)
+def weakly_dominates(a, b):
+    return all(x <= y for x, y in zip(a, b))
+
+
+def squared_distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+# Node of an ND-tree. Leaves hold (objectives, solution) points, inner nodes
+# hold children. ideal and nadir bound every point below the node from under
+# and from over; they only grow, so they stay valid bounds after removals.
+class _Node:
+    __slots__ = ("points", "children", "ideal", "nadir")
+
+    def __init__(self, points):
+        self.points = points
+        self.children = None
+        self.ideal = list(points[0][0])
+        self.nadir = list(points[0][0])
+        for objectives, _ in points[1:]:
+            self.expand(objectives)
+
+    def expand(self, objectives):
+        for k, value in enumerate(objectives):
+            if value < self.ideal[k]:
+                self.ideal[k] = value
+            if value > self.nadir[k]:
+                self.nadir[k] = value
+
+    def midpoint(self):
+        return [(low + high) / 2 for low, high in zip(self.ideal, self.nadir)]
+
+    def empty(self):
+        return not (self.points if self.children is None else self.children)
+
+
+# Archive of mutually non-dominated solutions, kept in an ND-tree (Jaszkiewicz
+# and Lust, 2018). An update only descends into nodes whose ideal/nadir box can
+# hold a point that dominates, or is dominated by, the new one, and whole
+# subtrees are accepted against or discarded by comparing with their bounds, so
+# an update typically visits a small part of the archive.
+class ParetoArchive:
+    def __init__(self, max_leaf=20, branching=None):
+        self.max_leaf = max_leaf
+        self.branching = branching
+        self.root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                yield from node.points
+            else:
+                stack.extend(node.children)
+
+    # Points sorted by objectives, i.e. by distance first
+    def front(self):
+        return sorted(self, key=lambda point: point[0])
+
+    # Offer a solution; returns True if it entered the archive. Points it
+    # dominates are removed. Ties with an archived point are rejected.
+    def add(self, objectives, solution):
+        objectives = tuple(objectives)
+        if self.root is None:
+            self.root = _Node([(objectives, solution)])
+            self._size = 1
+            return True
+        if not self._update(self.root, objectives):
+            return False
+        if self.root.empty():
+            self.root = _Node([(objectives, solution)])
+            self._size = 1
+            return True
+        self._insert(self.root, objectives, solution)
+        self._size += 1
+        return True
+
+    # Reject objectives dominated by a point under node, or drop the points they
+    # dominate. Returns False on rejection.
+    def _update(self, node, objectives):
+        if weakly_dominates(node.nadir, objectives):
+            return False
+        if weakly_dominates(objectives, node.ideal) and list(objectives) != node.ideal:
+            self._size -= self._count(node)
+            node.points, node.children = [], None
+            return True
+        if not (
+            weakly_dominates(node.ideal, objectives)
+            or weakly_dominates(objectives, node.nadir)
+        ):
+            return True
+
+        if node.children is None:
+            kept = []
+            for point in node.points:
+                if weakly_dominates(point[0], objectives):
+                    return False
+                if not weakly_dominates(objectives, point[0]):
+                    kept.append(point)
+            self._size -= len(node.points) - len(kept)
+            node.points = kept
+            return True
+
+        for child in node.children:
+            if not self._update(child, objectives):
+                return False
+        node.children = [child for child in node.children if not child.empty()]
+        if len(node.children) == 1:
+            child = node.children[0]
+            node.points, node.children = child.points, child.children
+        return True
+
+    def _count(self, node):
+        if node.children is None:
+            return len(node.points)
+        return sum(self._count(child) for child in node.children)
+
+    def _insert(self, node, objectives, solution):
+        while True:
+            node.expand(objectives)
+            if node.children is None:
+                break
+            node = min(
+                node.children,
+                key=lambda child: squared_distance(objectives, child.midpoint()),
+            )
+        node.points.append((objectives, solution))
+        if len(node.points) > self.max_leaf:
+            self._split(node)
+
+    # Split a full leaf around well-spread seed points: the point farthest from
+    # the others, then repeatedly the point farthest from the seeds so far
+    def _split(self, node):
+        points = node.points
+        branching = self.branching or len(points[0][0]) + 1
+
+        def spread(point):
+            return sum(squared_distance(point[0], other[0]) for other in points)
+
+        seeds = [max(points, key=spread)]
+        while len(seeds) < branching:
+            seeds.append(
+                max(
+                    points,
+                    key=lambda point: min(
+                        squared_distance(point[0], seed[0]) for seed in seeds
+                    ),
+                )
+            )
+        groups = [[] for _ in seeds]
+        for point in points:
+            closest = min(
+                range(len(seeds)),
+                key=lambda k: squared_distance(point[0], seeds[k][0]),
+            )
+            groups[closest].append(point)
+        node.children = [_Node(group) for group in groups if group]
+        node.points = None
+
+
+# Total lateness of a route: hours past each order's optional "due_time" (hours
+# after leaving the depot, at AVERAGE_SPEED as in route_summary)
+def route_lateness(route, depot_location):
+    lateness = 0
+    arrival = 0
+    prev_lat, prev_lng = depot_location["lat"], depot_location["lng"]
+    for order in route:
+        lat, lng = order["location"]["lat"], order["location"]["lng"]
+        arrival += haversine_distance(prev_lat, prev_lng, lat, lng) / AVERAGE_SPEED
+        if "due_time" in order:
+            lateness += max(arrival - order["due_time"], 0)
+        prev_lat, prev_lng = lat, lng
+    return lateness
+
+
+# (distance, time, vehicles used, lateness) from per-route evaluations
+def solution_objectives(evaluations):
+    distance = time = lateness = 0
+    vehicles_used = 0
+    for (route_dist, route_time, _, _), route_late, used in evaluations:
+        distance += route_dist
+        time += route_time
+        lateness += route_late
+        vehicles_used += used
+    return distance, time, vehicles_used, lateness
+
+
+# Multi-objective annealing: one run yields an approximation of the whole
+# front over OBJECTIVES instead of one weighted optimum. Acceptance uses a
+# weighted sum of objectives scaled by the initial solution's values, with
+# weights redrawn from a flat Dirichlet every weight_period iterations so the
+# walk sweeps across trade-offs. Every feasible solution visited is offered to
+# the archive, which is returned.
+def pareto_annealing(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_period=500,
+    archive=None,
+    rng=None,
+    move_weights=None,
+):
+    rng = make_rng(rng)
+    move_cdf = move_distribution(move_weights)
+    if archive is None:
+        archive = ParetoArchive()
+    has_due_times = any("due_time" in order for order in orders)
+
+    def evaluate(route):
+        lateness = route_lateness(route, depot_location) if has_due_times else 0
+        return route_summary(route, depot_location), lateness, 1 if route else 0
+
+    current_solution = [[] for _ in vehicles]
+    for i, k in enumerate(rng.permutation(len(orders))):
+        current_solution[i % len(vehicles)].append(orders[k])
+    current_evaluations = [evaluate(route) for route in current_solution]
+    current_objectives = solution_objectives(current_evaluations)
+    if summaries_valid([e[0] for e in current_evaluations], vehicles):
+        archive.add(current_objectives, current_solution)
+
+    # Scale objectives so a weight of 1 means "as much as the starting solution"
+    scale = [1 / value if value > 0 else 1.0 for value in current_objectives]
+
+    temperature = initial_temp
+    for iteration in range(max_iterations):
+        if temperature <= 0:
+            break
+        if iteration % weight_period == 0:
+            weights = rng.dirichlet(np.ones(len(OBJECTIVES))) * scale
+
+        _, new_solution = generate_neighbor(current_solution, rng, move_cdf)
+        new_evaluations = [
+            evaluation if new_route is route else evaluate(new_route)
+            for new_route, route, evaluation in zip(
+                new_solution, current_solution, current_evaluations
+            )
+        ]
+        if not summaries_valid([e[0] for e in new_evaluations], vehicles):
+            continue
+
+        new_objectives = solution_objectives(new_evaluations)
+        archive.add(new_objectives, new_solution)
+
+        # The weighted difference is relative, so the temperature is too
+        delta = float(np.dot(weights, np.subtract(new_objectives, current_objectives)))
+        if delta < 0 or rng.random() < math.exp(-delta * initial_temp / temperature):
+            current_solution = new_solution
+            current_evaluations = new_evaluations
+            current_objectives = new_objectives
+
+        temperature *= cooling_rate
+
+    return archive
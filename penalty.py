@@ -0,0 +1,52 @@
+# Self-adjusting capacity penalties for searching through infeasible solutions,
+# after Cordeau, Laporte and Mercier: each coefficient is multiplied by (1 + delta)
+# after an iteration whose current solution violates that constraint and divided
+# by (1 + delta) otherwise. Pass an instance as simulated_annealing(penalty=...).
+class AdaptivePenalty:
+    def __init__(
+        self,
+        weight_coefficient=1.0,
+        volume_coefficient=1.0,
+        delta=0.05,
+        min_coefficient=1e-3,
+        max_coefficient=1e9,
+    ):
+        self.weight_coefficient = weight_coefficient
+        self.volume_coefficient = volume_coefficient
+        self.delta = delta
+        self.min_coefficient = min_coefficient
+        self.max_coefficient = max_coefficient
+
+    # Total weight and volume above vehicle capacities, from route summaries
+    def excess(self, summaries, vehicles):
+        excess_weight = 0
+        excess_volume = 0
+        for vehicle, (_, _, route_weight, route_volume) in zip(vehicles, summaries):
+            excess_weight += max(route_weight - vehicle["capacity_weight"], 0)
+            excess_volume += max(route_volume - vehicle["capacity_volume"], 0)
+        return excess_weight, excess_volume
+
+    def cost(self, excess):
+        excess_weight, excess_volume = excess
+        return (
+            self.weight_coefficient * excess_weight
+            + self.volume_coefficient * excess_volume
+        )
+
+    def update(self, excess):
+        excess_weight, excess_volume = excess
+        self.weight_coefficient = self._adjust(self.weight_coefficient, excess_weight)
+        self.volume_coefficient = self._adjust(self.volume_coefficient, excess_volume)
+
+    def _adjust(self, coefficient, excess):
+        if excess > 0:
+            coefficient *= 1 + self.delta
+        else:
+            coefficient /= 1 + self.delta
+        return min(max(coefficient, self.min_coefficient), self.max_coefficient)
+
+    def state(self):
+        return self.weight_coefficient, self.volume_coefficient
+
+    def restore(self, state):
+        self.weight_coefficient, self.volume_coefficient = state
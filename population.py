@@ -0,0 +1,158 @@
+import numpy as np
+
+from annealing import AVERAGE_SPEED, distance_matrix, make_rng, total_distance
+from spatial import spatially_sorted
+
+POPULATION_MOVES = ["swap", "relocate", "2-opt"]
+
+
+# Encode routes as a giant tour: node ids (order index + 1) with a 0 (depot)
+# before every route and at the end, so every row has len(orders) + len(routes) + 1 entries
+def encode_giant_tour(routes, index_of):
+    tour = [0]
+    for route in routes:
+        tour.extend(index_of[id(order)] + 1 for order in route)
+        tour.append(0)
+    return tour
+
+
+# Split a giant tour back into routes of order dicts
+def decode_giant_tour(tour, orders):
+    routes = [[]]
+    for node in tour[1:-1].tolist():
+        if node == 0:
+            routes.append([])
+        else:
+            routes[-1].append(orders[node - 1])
+    return routes
+
+
+# Score, distance, time and per-route loads for a whole population in one pass.
+# tours is a (P, L) array of giant tours; loads come back as (P, V) arrays.
+def evaluate_population(
+    tours, dist, weights, volumes, n_routes, weight_distance, weight_time
+):
+    legs = dist[tours[:, :-1], tours[:, 1:]]
+    distances = legs.sum(axis=1)
+    # Travel time excludes the legs returning to the depot
+    times = np.where(tours[:, 1:] != 0, legs, 0.0).sum(axis=1) / AVERAGE_SPEED
+
+    # Route number of every position; depot delimiters carry no load
+    route_index = np.minimum(np.cumsum(tours == 0, axis=1) - 1, n_routes - 1)
+    flat_index = (route_index + n_routes * np.arange(len(tours))[:, None]).ravel()
+    shape = (len(tours), n_routes)
+    size = shape[0] * shape[1]
+    loads_weight = np.bincount(flat_index, weights[tours].ravel(), size).reshape(shape)
+    loads_volume = np.bincount(flat_index, volumes[tours].ravel(), size).reshape(shape)
+
+    scores = weight_distance * distances + weight_time * times
+    return scores, distances, times, loads_weight, loads_volume
+
+
+# One random move per population member, built as a per-row index map over the
+# interior positions (the first and last depot never move). Swapping, relocating
+# or reversing interior positions always yields another valid giant tour; moving
+# a delimiter shifts a route boundary.
+def population_neighbors(tours, rng):
+    n_rows, length = tours.shape
+    i = rng.integers(1, length - 1, n_rows)
+    j = rng.integers(1, length - 1, n_rows)
+    lo, hi = np.minimum(i, j)[:, None], np.maximum(i, j)[:, None]
+    move = rng.integers(len(POPULATION_MOVES), size=n_rows)[:, None]
+    k = np.arange(length)[None, :]
+
+    swap = np.where(k == lo, hi, np.where(k == hi, lo, k))
+    # Relocate the element at i to position j
+    forward = (i < j)[:, None]
+    relocate = np.where(
+        forward,
+        np.where((k >= lo) & (k < hi), k + 1, np.where(k == hi, lo, k)),
+        np.where((k > lo) & (k <= hi), k - 1, np.where(k == lo, hi, k)),
+    )
+    reverse = np.where((k >= lo) & (k <= hi), lo + hi - k, k)
+
+    index = np.where(move == 0, swap, np.where(move == 1, relocate, reverse))
+    return np.take_along_axis(tours, index, axis=1)
+
+
+# Simulated annealing over a population of P solutions at once.
+# Members share one temperature schedule; moves, scoring, capacity checks and
+# acceptance are vectorized across the population. Semantics follow
+# simulated_annealing: infeasible neighbors are rejected and the best member seen is returned.
+def population_annealing(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp,
+    cooling_rate,
+    max_iterations,
+    weight_distance,
+    weight_time,
+    population_size=32,
+    rng=None,
+    curve="hilbert",
+):
+    rng = make_rng(rng)
+    # Renumber orders along a space-filling curve before building the matrix
+    orders = spatially_sorted(orders, curve)
+    n_routes = len(vehicles)
+
+    dist = np.array(distance_matrix(orders, depot_location))
+    weights = np.array([0.0] + [order["weight"] for order in orders])
+    volumes = np.array([0.0] + [order["volume"] for order in orders])
+    capacity_weight = np.array([vehicle["capacity_weight"] for vehicle in vehicles])
+    capacity_volume = np.array([vehicle["capacity_volume"] for vehicle in vehicles])
+
+    # Initial random solutions, assigned round-robin like simulated_annealing
+    index_of = {id(order): k for k, order in enumerate(orders)}
+    tours = []
+    for _ in range(population_size):
+        routes = [[] for _ in vehicles]
+        for i, k in enumerate(rng.permutation(len(orders))):
+            routes[i % n_routes].append(orders[k])
+        tours.append(encode_giant_tour(routes, index_of))
+    tours = np.array(tours)
+
+    def evaluate(candidates):
+        scores, _, _, loads_weight, loads_volume = evaluate_population(
+            candidates, dist, weights, volumes, n_routes, weight_distance, weight_time
+        )
+        valid = (loads_weight <= capacity_weight).all(axis=1) & (
+            loads_volume <= capacity_volume
+        ).all(axis=1)
+        return scores, valid
+
+    current_scores, _ = evaluate(tours)
+    best = int(np.argmin(current_scores))
+    best_tour, best_score = tours[best].copy(), current_scores[best]
+
+    temperature = initial_temp
+    for _ in range(max_iterations):
+        if temperature <= 0:
+            break
+
+        candidates = population_neighbors(tours, rng)
+        new_scores, valid = evaluate(candidates)
+
+        # Metropolis acceptance for every member at once
+        with np.errstate(over="ignore"):
+            probability = np.exp(
+                np.minimum((current_scores - new_scores) / temperature, 0)
+            )
+        accept = valid & (
+            (new_scores < current_scores) | (rng.random(population_size) < probability)
+        )
+        tours = np.where(accept[:, None], candidates, tours)
+        current_scores = np.where(accept, new_scores, current_scores)
+
+        member = int(np.argmin(current_scores))
+        if current_scores[member] < best_score:
+            best_tour, best_score = tours[member].copy(), current_scores[member]
+
+        temperature *= cooling_rate
+
+    best_solution = decode_giant_tour(best_tour, orders)
+    best_score, _, _ = total_distance(
+        best_solution, depot_location, weight_distance, weight_time
+    )
+    return best_solution, best_score
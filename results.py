@@ -0,0 +1,188 @@
+import csv
+import json
+from itertools import zip_longest
+
+from annealing import AVERAGE_SPEED, haversine_distance
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow/Parquet output is optional
+    pa = None
+
+ROUTE_COLUMNS = [
+    "routes__vehicle_id",
+    "routes__order_count",
+    "routes__load_weight",
+    "routes__load_volume",
+    "routes__distance",
+    "routes__time",
+    "routes__return_time",
+]
+STOP_COLUMNS = [
+    "stops__vehicle_id",
+    "stops__sequence",
+    "stops__order_id",
+    "stops__leg_distance",
+    "stops__arrival_time",
+]
+
+
+# One record per vehicle: order ids in visiting order, loads, distance, travel
+# time (as scored by total_distance, i.e. up to the last order), the time back
+# at the depot and the arrival time at each stop. Times are hours after leaving
+# the depot at AVERAGE_SPEED. Legs come from the distance oracle
+# when one is given.
+def route_records(solution, vehicles, depot_location, oracle=None):
+    for vehicle, route in zip(vehicles, solution):
+        if oracle is not None:
+            *legs, return_leg = oracle.legs(route).tolist()
+        else:
+            *legs, return_leg = route_legs(route, depot_location)
+        distance = 0
+        travel_time = 0
+        arrivals = []
+        for leg in legs:
+            distance += leg
+            travel_time += leg / AVERAGE_SPEED
+            arrivals.append(travel_time)
+        yield {
+            "vehicle_id": vehicle["id"],
+            "order_ids": [order["id"] for order in route],
+            "load_weight": sum(order["weight"] for order in route),
+            "load_volume": sum(order["volume"] for order in route),
+            "distance": distance + return_leg,
+            "time": travel_time,
+            "return_time": travel_time + return_leg / AVERAGE_SPEED,
+            "leg_distances": legs,
+            "arrival_times": arrivals,
+        }
+
+
+# Leg distances of a route: depot -> orders -> depot
+def route_legs(route, depot_location):
+    points = [(depot_location["lat"], depot_location["lng"])]
+    points += [(order["location"]["lat"], order["location"]["lng"]) for order in route]
+    points.append(points[0])
+    return [
+        haversine_distance(lat1, lng1, lat2, lng2)
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:])
+    ]
+
+
+# Stream a solution as JSON, one route at a time
+def write_json(path, solution, vehicles, depot_location, best_score=None):
+    with open(path, "w") as f:
+        f.write(f'{{"best_score": {json.dumps(best_score)}, "routes": [')
+        for k, record in enumerate(route_records(solution, vehicles, depot_location)):
+            f.write(",\n" if k else "\n")
+            f.write(json.dumps(record))
+        f.write("\n]}\n")
+
+
+# CSV in the flattened, fully quoted layout of result.csv: a routes__ section
+# with one row per vehicle next to a stops__ section with one row per stop,
+# shorter sections padded with empty cells. Stop rows are streamed out.
+def write_csv(path, solution, vehicles, depot_location):
+    records = list(route_records(solution, vehicles, depot_location))
+
+    def route_rows():
+        for record in records:
+            yield [
+                record["vehicle_id"],
+                len(record["order_ids"]),
+                record["load_weight"],
+                record["load_volume"],
+                record["distance"],
+                record["time"],
+                record["return_time"],
+            ]
+
+    def stop_rows():
+        for record in records:
+            stops = zip(
+                record["order_ids"], record["leg_distances"], record["arrival_times"]
+            )
+            for sequence, (order_id, leg, arrival) in enumerate(stops, 1):
+                yield [record["vehicle_id"], sequence, order_id, leg, arrival]
+
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(ROUTE_COLUMNS + STOP_COLUMNS)
+        empty_route, empty_stop = [""] * len(ROUTE_COLUMNS), [""] * len(STOP_COLUMNS)
+        for route_row, stop_row in zip_longest(route_rows(), stop_rows()):
+            writer.writerow((route_row or empty_route) + (stop_row or empty_stop))
+
+
+# Arrow schema: one row per route, order ids and schedule as list columns.
+# Fixed up front so batches of empty routes share the types of the others.
+def _arrow_schema(solution, vehicles):
+    order_id = next((order["id"] for route in solution for order in route), 0)
+    order_id_type = pa.scalar(order_id).type
+    return pa.schema(
+        [
+            ("vehicle_id", pa.scalar(vehicles[0]["id"]).type),
+            ("order_ids", pa.list_(order_id_type)),
+            ("load_weight", pa.float64()),
+            ("load_volume", pa.float64()),
+            ("distance", pa.float64()),
+            ("time", pa.float64()),
+            ("return_time", pa.float64()),
+            ("leg_distances", pa.list_(pa.float64())),
+            ("arrival_times", pa.list_(pa.float64())),
+        ]
+    )
+
+
+def _arrow_batches(solution, vehicles, depot_location, batch_size):
+    schema = _arrow_schema(solution, vehicles)
+    batch = []
+    for record in route_records(solution, vehicles, depot_location):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield pa.RecordBatch.from_pylist(batch, schema=schema)
+            batch = []
+    if batch:
+        yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Arrow and Parquet output need pyarrow: pip install pyarrow")
+
+
+# Arrow IPC file; readers can memory-map it without copying
+def write_arrow(path, solution, vehicles, depot_location, batch_size=1024):
+    _require_pyarrow()
+    schema = _arrow_schema(solution, vehicles)
+    with pa.ipc.new_file(path, schema) as writer:
+        for batch in _arrow_batches(solution, vehicles, depot_location, batch_size):
+            writer.write_batch(batch)
+
+
+# Parquet file written one row group per batch of routes
+def write_parquet(path, solution, vehicles, depot_location, batch_size=1024):
+    _require_pyarrow()
+    schema = _arrow_schema(solution, vehicles)
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in _arrow_batches(solution, vehicles, depot_location, batch_size):
+            writer.write_batch(batch)
+
+
+WRITERS = {
+    "json": write_json,
+    "csv": write_csv,
+    "arrow": write_arrow,
+    "parquet": write_parquet,
+}
+
+
+# Pick a writer from the file extension (.json, .csv, .arrow/.feather, .parquet)
+def write_solution(path, solution, vehicles, depot_location, best_score=None):
+    extension = path.rsplit(".", 1)[-1].lower()
+    extension = {"feather": "arrow", "ipc": "arrow"}.get(extension, extension)
+    if extension not in WRITERS:
+        raise ValueError(f"Unknown result format: {path}")
+    if extension == "json":
+        return write_json(path, solution, vehicles, depot_location, best_score)
+    return WRITERS[extension](path, solution, vehicles, depot_location)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+from annealing import route_summary
+
+
+# Bounded LRU cache of route summaries (distance, time, weight, volume).
+# Entries are keyed by the route's order-id sequence, so a route evaluated once
+# is never re-evaluated while it stays cached, whichever solution it appears in.
+# Share one cache between restarts and chains of the same instance: summaries
+# depend only on the route, so sharing never changes results. Chains in one
+# process (run_chains with workers=1 or the thread backend) share it under a
+# lock; worker processes each work on their own copy. Misses are priced by the
+# distance oracle when one is given, outside the lock.
+class RouteCache:
+    def __init__(self, depot_location, maxsize=65536, oracle=None):
+        self.depot_location = depot_location
+        self.maxsize = maxsize
+        self.oracle = oracle
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Locks do not pickle; a copy sent to a worker process gets a fresh one
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # Compact key for a route: its order ids as a tuple
+    @staticmethod
+    def key(route):
+        return tuple(order["id"] for order in route)
+
+    def evaluate(self, route):
+        key = self.key(route)
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return summary
+            self.misses += 1
+
+        if self.oracle is not None:
+            summary = self.oracle.route_summary(route)
+        else:
+            summary = route_summary(route, self.depot_location)
+        with self._lock:
+            self._entries[key] = summary
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
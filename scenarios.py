@@ -0,0 +1,222 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import annealing
+from annealing import simulated_annealing, summaries_valid
+from chains import chain_seeds
+from distance_oracle import DistanceOracle
+from penalty import AdaptivePenalty
+from results import route_records
+from spatial import spatially_sorted
+
+# Base instance of the worker processes, set once per worker by set_base
+_base = None
+
+
+# Prepare a base instance once: its distance oracle and a full solve whose best
+# solution warm-starts every scenario
+def prepare_base(
+    vehicles,
+    orders,
+    depot_location,
+    initial_temp=annealing.initial_temp,
+    cooling_rate=annealing.cooling_rate,
+    max_iterations=annealing.max_iterations,
+    weight_distance=annealing.weight_distance,
+    weight_time=annealing.weight_time,
+    polish=annealing.polish,
+    seed=annealing.seed,
+):
+    oracle = DistanceOracle(spatially_sorted(orders), depot_location)
+    best_solution, best_score = simulated_annealing(
+        vehicles,
+        orders,
+        depot_location,
+        initial_temp,
+        cooling_rate,
+        max_iterations,
+        weight_distance,
+        weight_time,
+        polish=polish,
+        rng=seed,
+        oracle=oracle,
+    )
+    return {
+        "vehicles": vehicles,
+        "orders": orders,
+        "depot_location": depot_location,
+        "oracle": oracle,
+        "best_solution": best_solution,
+        "best_score": best_score,
+        "weight_distance": weight_distance,
+        "weight_time": weight_time,
+    }
+
+
+# Apply a scenario as an overlay on the base instance. Recognized keys, all
+# optional:
+#   vehicles        replacement vehicle list
+#   drop_vehicles   vehicle ids to remove
+#   capacity_scale  factor on every vehicle's weight and volume capacity
+#   keep_orders     order ids to keep (default: all)
+#   drop_orders     order ids to remove
+#   weight_scale, volume_scale  factors on every order's weight and volume
+#   depot_location  a new depot
+# Untouched orders and vehicles are shared with the base, as is the oracle's
+# kNN structure. Returns (vehicles, orders, depot_location, oracle).
+def apply_scenario(base, scenario):
+    vehicles = scenario.get("vehicles", base["vehicles"])
+    dropped = set(scenario.get("drop_vehicles", ()))
+    vehicles = [vehicle for vehicle in vehicles if vehicle["id"] not in dropped]
+    capacity_scale = scenario.get("capacity_scale", 1.0)
+    if capacity_scale != 1.0:
+        vehicles = [
+            dict(
+                vehicle,
+                capacity_weight=vehicle["capacity_weight"] * capacity_scale,
+                capacity_volume=vehicle["capacity_volume"] * capacity_scale,
+            )
+            for vehicle in vehicles
+        ]
+
+    orders = base["orders"]
+    if "keep_orders" in scenario:
+        keep = set(scenario["keep_orders"])
+        orders = [order for order in orders if order["id"] in keep]
+    dropped = set(scenario.get("drop_orders", ()))
+    if dropped:
+        orders = [order for order in orders if order["id"] not in dropped]
+    weight_scale = scenario.get("weight_scale", 1.0)
+    volume_scale = scenario.get("volume_scale", 1.0)
+    if weight_scale != 1.0 or volume_scale != 1.0:
+        orders = [
+            dict(
+                order,
+                weight=order["weight"] * weight_scale,
+                volume=order["volume"] * volume_scale,
+            )
+            for order in orders
+        ]
+
+    depot_location = scenario.get("depot_location", base["depot_location"])
+    oracle = base["oracle"].overlay(
+        orders=orders if orders is not base["orders"] else None,
+        depot_location=scenario.get("depot_location"),
+    )
+    return vehicles, orders, depot_location, oracle
+
+
+# Map the base best solution onto a scenario: routes follow their vehicle ids,
+# orders missing from the scenario are dropped, and orders whose vehicle is gone
+# are appended to the route with the most weight capacity left
+def warm_start(base, vehicles, orders):
+    order_by_id = {order["id"]: order for order in orders}
+    route_of_vehicle = {
+        vehicle["id"]: route
+        for vehicle, route in zip(base["vehicles"], base["best_solution"])
+    }
+    routes, loads = [], []
+    for vehicle in vehicles:
+        route = [
+            order_by_id[order["id"]]
+            for order in route_of_vehicle.get(vehicle["id"], ())
+            if order["id"] in order_by_id
+        ]
+        routes.append(route)
+        loads.append(sum(order["weight"] for order in route))
+
+    placed = {order["id"] for route in routes for order in route}
+    for order in orders:
+        if order["id"] in placed:
+            continue
+        k = max(
+            range(len(vehicles)),
+            key=lambda k: vehicles[k]["capacity_weight"] - loads[k],
+        )
+        routes[k].append(order)
+        loads[k] += order["weight"]
+    return routes
+
+
+def set_base(base):
+    global _base
+    _base = base
+
+
+# Solve one scenario against the worker's base. A warm start that breaks
+# capacity (e.g. after dropping a truck) is repaired under adaptive penalties.
+def solve_scenario(task):
+    scenario, seed, params = task
+    started = time.perf_counter()
+    vehicles, orders, depot_location, oracle = apply_scenario(_base, scenario)
+    initial_solution = warm_start(_base, vehicles, orders)
+    summaries = [oracle.route_summary(route) for route in initial_solution]
+    penalty = None if summaries_valid(summaries, vehicles) else AdaptivePenalty()
+
+    best_solution, best_score = simulated_annealing(
+        vehicles,
+        orders,
+        depot_location,
+        params["initial_temp"],
+        params["cooling_rate"],
+        params["max_iterations"],
+        _base["weight_distance"],
+        _base["weight_time"],
+        polish=params["polish"],
+        rng=seed,
+        penalty=penalty,
+        oracle=oracle,
+        initial_solution=initial_solution,
+    )
+    return {
+        "name": scenario.get("name"),
+        "best_score": best_score,
+        "base_score": _base["best_score"],
+        "delta": best_score - _base["best_score"],
+        "feasible": best_score != float("inf"),
+        "elapsed": time.perf_counter() - started,
+        "routes": list(route_records(best_solution, vehicles, depot_location, oracle)),
+    }
+
+
+# Solve many what-if variants of a prepared base. Workers are forked where the
+# platform allows, so they share the base instance and its oracle copy-on-write;
+# elsewhere each worker receives the base once. Each scenario starts from the
+# base best solution, so the defaults anneal cooler and shorter than a full
+# solve. Yields one result per scenario, in input order.
+def solve_scenarios(
+    base,
+    scenarios,
+    initial_temp=annealing.initial_temp / 10,
+    cooling_rate=annealing.cooling_rate,
+    max_iterations=annealing.max_iterations // 2,
+    polish=annealing.polish,
+    master_seed=annealing.seed,
+    workers=None,
+):
+    scenarios = list(scenarios)
+    params = {
+        "initial_temp": initial_temp,
+        "cooling_rate": cooling_rate,
+        "max_iterations": max_iterations,
+        "polish": polish,
+    }
+    tasks = [
+        (scenario, seed, params)
+        for scenario, seed in zip(scenarios, chain_seeds(master_seed, len(scenarios)))
+    ]
+    if workers == 1:
+        set_base(base)
+        yield from map(solve_scenario, tasks)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=set_base,
+        initargs=(base,),
+    ) as pool:
+        yield from pool.map(solve_scenario, tasks)
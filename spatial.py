@@ -0,0 +1,70 @@
+import numpy as np
+
+CURVES = ["hilbert", "morton"]
+
+
+# Snap coordinates onto a 2**bits x 2**bits integer grid over their bounding box
+def grid_coordinates(lats, lngs, bits):
+    cells = (1 << bits) - 1
+    lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+
+    def scale(values):
+        low, span = values.min(), np.ptp(values)
+        if span == 0:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.round((values - low) / span * cells).astype(np.int64)
+
+    return scale(lngs), scale(lats)
+
+
+# Position of each grid cell along a Hilbert curve (vectorized xy -> d)
+def hilbert_index(x, y, bits):
+    n = 1 << bits
+    x, y = x.copy(), y.copy()
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        flip = (ry == 0) & (rx == 1)
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ry == 0
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+
+# Position of each grid cell along a Morton (Z-order) curve: interleaved bits
+def morton_index(x, y, bits):
+    d = np.zeros(len(x), dtype=np.int64)
+    for bit in range(bits):
+        d |= ((x >> bit) & 1) << (2 * bit)
+        d |= ((y >> bit) & 1) << (2 * bit + 1)
+    return d
+
+
+# Permutation that visits orders along a space-filling curve over their lat/lng
+def curve_order(orders, curve="hilbert", bits=16):
+    if curve not in CURVES:
+        raise ValueError(f"Unknown curve: {curve}")
+    if not orders:
+        return np.zeros(0, dtype=np.int64)
+    x, y = grid_coordinates(
+        [order["location"]["lat"] for order in orders],
+        [order["location"]["lng"] for order in orders],
+        bits,
+    )
+    index = hilbert_index if curve == "hilbert" else morton_index
+    return np.argsort(index(x, y, bits), kind="stable")
+
+
+# Orders renumbered along a curve, so geographically close orders get nearby
+# matrix rows and neighbor-list moves stay in cache. The order dicts (and their
+# ids) are unchanged, so solutions built from the result need no mapping back.
+def spatially_sorted(orders, curve="hilbert", bits=16):
+    if curve is None:
+        return list(orders)
+    return [orders[k] for k in curve_order(orders, curve, bits).tolist()]
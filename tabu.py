@@ -0,0 +1,98 @@
+import math
+
+import numpy as np
+
+from annealing import ROUTE_END, ROUTE_START
+
+MASK64 = (1 << 64) - 1
+
+
+# splitmix64 finalizer: spreads a sum of keys over all 64 bits
+def mix64(x):
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+# Zobrist-style solution hashing with a fixed-size tabu table. Pass an instance
+# as simulated_annealing(tabu=...).
+# A solution hashes to the XOR of one key per route edge, the key mixing
+# random numbers for the route index and both ends (orders, or the depot at
+# the route's start or end). Moves report the edges they toggle, so a
+# neighbor's hash costs O(1) and is known before the neighbor is evaluated.
+# Edge keys ignore direction, which still identifies a route: its edges form a
+# single path from the start depot to the end depot.
+# The table is direct-mapped on the low bits of the hash: each slot keeps the
+# last hash stored there and the iteration it was seen, so recent states are
+# remembered and old ones fade out. It is not part of checkpoints; a resumed
+# run starts with an empty table.
+class ZobristTabu:
+    def __init__(self, orders, n_routes, bits=16, tenure=1000, seed=0):
+        keys = np.random.default_rng(seed).integers(
+            0, 1 << 64, size=len(orders) + n_routes + 2, dtype=np.uint64
+        ).tolist()
+        self.order_keys = {order["id"]: key for order, key in zip(orders, keys)}
+        self.route_keys = keys[len(orders) : len(orders) + n_routes]
+        self.end_keys = {ROUTE_START: keys[-2], ROUTE_END: keys[-1]}
+        self.tenure = math.inf if tenure is None else tenure
+        self.mask = (1 << bits) - 1
+        self.hashes = [-1] * (1 << bits)
+        self.iterations = [0] * (1 << bits)
+        self.lookups = 0
+        self.hits = 0
+
+    def end_key(self, end):
+        if isinstance(end, str):
+            return self.end_keys[end]
+        return self.order_keys[end["id"]]
+
+    def edge_key(self, route_index, a, b):
+        return mix64(
+            (self.route_keys[route_index] + self.end_key(a) + self.end_key(b)) & MASK64
+        )
+
+    # Full hash of a solution, from scratch
+    def solution_hash(self, routes):
+        h = 0
+        for r, route in enumerate(routes):
+            ends = [ROUTE_START] + route + [ROUTE_END]
+            for a, b in zip(ends, ends[1:]):
+                h ^= self.edge_key(r, a, b)
+        return h
+
+    # Hash after a move that toggled edges, as recorded by generate_neighbor.
+    # Runs every iteration, so edge_key and mix64 are inlined.
+    def toggle(self, h, edges):
+        route_keys, order_keys, end_keys = self.route_keys, self.order_keys, self.end_keys
+        for r, a, b in edges:
+            x = route_keys[r]
+            x += end_keys[a] if isinstance(a, str) else order_keys[a["id"]]
+            x += end_keys[b] if isinstance(b, str) else order_keys[b["id"]]
+            x &= MASK64
+            x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+            x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+            h ^= x ^ (x >> 31)
+        return h
+
+    # Was this state stored within the last tenure iterations?
+    def seen(self, h, iteration):
+        self.lookups += 1
+        slot = h & self.mask
+        if self.hashes[slot] == h and iteration - self.iterations[slot] <= self.tenure:
+            self.hits += 1
+            return True
+        return False
+
+    def remember(self, h, iteration):
+        slot = h & self.mask
+        self.hashes[slot] = h
+        self.iterations[slot] = iteration
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "slots": len(self.hashes),
+            "tenure": self.tenure,
+        }
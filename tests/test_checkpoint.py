@@ -0,0 +1,82 @@
+import pytest
+
+import annealing
+from annealing import simulated_annealing
+from checkpoint import Checkpointer, resume_annealing
+from penalty import AdaptivePenalty
+
+
+class Interrupted(Exception):
+    pass
+
+
+# Saves once at the given iteration, then stops the run as a crash would
+class InterruptingCheckpointer(Checkpointer):
+    def __init__(self, path, at):
+        super().__init__(path, interval=0.0)
+        self.at = at
+
+    def due(self):
+        return True
+
+    def save(self, state):
+        if state["iteration"] == self.at:
+            super().save(state)
+            raise Interrupted
+
+
+def route_ids(routes):
+    return [[order["id"] for order in route] for route in routes]
+
+
+# A tight fleet with adaptive penalties also restores the penalty coefficients
+@pytest.mark.parametrize(
+    "capacity_scale, make_penalty", [(1.0, None), (0.15, AdaptivePenalty)]
+)
+def test_resumed_run_matches_uninterrupted_run(tmp_path, capacity_scale, make_penalty):
+    vehicles = [
+        dict(
+            vehicle,
+            capacity_weight=vehicle["capacity_weight"] * capacity_scale,
+            capacity_volume=vehicle["capacity_volume"] * capacity_scale,
+        )
+        for vehicle in annealing.vehicles
+    ]
+    args = (
+        vehicles,
+        annealing.orders,
+        annealing.depot_location,
+        annealing.initial_temp,
+        annealing.cooling_rate,
+        3000,
+        annealing.weight_distance,
+        annealing.weight_time,
+    )
+
+    def penalty():
+        return None if make_penalty is None else make_penalty()
+
+    expected_solution, expected_score = simulated_annealing(
+        *args, rng=7, polish=None, penalty=penalty()
+    )
+
+    path = str(tmp_path / "run.ckpt")
+    with pytest.raises(Interrupted):
+        simulated_annealing(
+            *args,
+            rng=7,
+            polish=None,
+            penalty=penalty(),
+            checkpointer=InterruptingCheckpointer(path, at=1234),
+        )
+    solution, score = resume_annealing(
+        path,
+        vehicles,
+        annealing.orders,
+        annealing.depot_location,
+        polish=None,
+        penalty=penalty(),
+    )
+
+    assert score == expected_score
+    assert route_ids(solution) == route_ids(expected_solution)
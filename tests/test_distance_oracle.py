@@ -0,0 +1,46 @@
+import math
+import random
+
+from annealing import distance_matrix, total_distance
+from distance_oracle import DistanceOracle
+
+
+def random_instance(rng, n):
+    orders = [
+        {
+            "id": i,
+            "weight": 1,
+            "volume": 1,
+            "location": {"lat": rng.uniform(-60, 60), "lng": rng.uniform(-170, 170)},
+        }
+        for i in range(n)
+    ]
+    return orders, {"lat": rng.uniform(-60, 60), "lng": rng.uniform(-170, 170)}
+
+
+# The kNN ranking rewrites haversine_distance algebraically (including its
+# quirks), so the oracle is pinned to the dense matrix on wide-spread points
+def test_oracle_matches_distance_matrix():
+    rng = random.Random(0)
+    for n in (2, 5, 40, 120):
+        orders, depot = random_instance(rng, n)
+        dist = distance_matrix(orders, depot)
+        oracle = DistanceOracle(orders, depot, k=8)
+
+        for i in range(n + 1):
+            for j in range(n + 1):
+                assert math.isclose(oracle.distance(i, j), dist[i][j], rel_tol=1e-9)
+                assert math.isclose(oracle[i][j], dist[i][j], rel_tol=1e-9)
+
+        for i in range(1, n + 1):
+            others = sorted(
+                (j for j in range(1, n + 1) if j != i), key=dist[i].__getitem__
+            )
+            assert oracle.neighbors(i) == others[: oracle.k]
+
+        routes = [orders[k::3] for k in range(3)]
+        for weight_distance, weight_time in ((0.5, 0.5), (1, 0), (0.2, 3)):
+            expected = total_distance(routes, depot, weight_distance, weight_time)
+            actual = total_distance(routes, depot, weight_distance, weight_time, oracle)
+            for e, a in zip(expected, actual):
+                assert math.isclose(a, e, rel_tol=1e-9)
@@ -0,0 +1,82 @@
+import itertools
+import math
+import random
+
+from annealing import distance_matrix, make_rng, total_distance
+from giant_tour import giant_tour_annealing, giant_tour_neighbor, split
+
+
+def random_instance(rng, n, n_vehicles):
+    orders = [
+        {
+            "id": i,
+            "weight": rng.randint(1, 5),
+            "volume": rng.randint(1, 5),
+            "location": {"lat": 10 + rng.random(), "lng": 93 + rng.random()},
+        }
+        for i in range(n)
+    ]
+    vehicles = [
+        {"id": k, "capacity_weight": rng.randint(4, 12), "capacity_volume": rng.randint(4, 12)}
+        for k in range(n_vehicles)
+    ]
+    return orders, vehicles, {"lat": 10.5, "lng": 93.5}
+
+
+# Cheapest split by trying every way to cut the tour into one segment per vehicle
+def brute_force_split(tour, orders, vehicles, depot_location, weight_distance, weight_time):
+    n, best = len(tour), math.inf
+    for cuts in itertools.combinations_with_replacement(range(n + 1), len(vehicles) - 1):
+        bounds = (0,) + cuts + (n,)
+        routes = [
+            [orders[node - 1] for node in tour[i:j]] for i, j in zip(bounds, bounds[1:])
+        ]
+        if all(
+            sum(o["weight"] for o in route) <= vehicle["capacity_weight"]
+            and sum(o["volume"] for o in route) <= vehicle["capacity_volume"]
+            for route, vehicle in zip(routes, vehicles)
+        ):
+            score, _, _ = total_distance(
+                routes, depot_location, weight_distance, weight_time
+            )
+            best = min(best, score)
+    return best
+
+
+def test_split_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        orders, vehicles, depot = random_instance(rng, rng.randint(1, 7), rng.randint(1, 3))
+        weight_distance, weight_time = rng.choice([(0.5, 0.5), (1, 0), (0, 1), (0.2, 3)])
+        dist = distance_matrix(orders, depot)
+        weights = [0] + [o["weight"] for o in orders]
+        volumes = [0] + [o["volume"] for o in orders]
+        tour = rng.sample(range(1, len(orders) + 1), len(orders))
+
+        cost, routes = split(
+            tour, dist, weights, volumes, vehicles, weight_distance, weight_time
+        )
+        expected = brute_force_split(
+            tour, orders, vehicles, depot, weight_distance, weight_time
+        )
+        if expected == math.inf:
+            assert cost == math.inf and routes is None
+            continue
+        assert math.isclose(cost, expected, rel_tol=1e-9)
+        decoded = [[orders[node - 1] for node in route] for route in routes]
+        score, _, _ = total_distance(decoded, depot, weight_distance, weight_time)
+        assert math.isclose(score, cost, rel_tol=1e-9)
+
+
+# Instances with fewer than two orders have a single tour to anneal
+def test_annealing_with_fewer_than_two_orders():
+    rng = random.Random(1)
+    for n in (0, 1):
+        orders, vehicles, depot = random_instance(rng, n, 2)
+        routes, score = giant_tour_annealing(
+            vehicles, orders, depot, 1000, 0.99, 50, 0.5, 0.5, rng=0
+        )
+        assert sorted(o["id"] for route in routes for o in route) == list(range(n))
+        expected, _, _ = total_distance(routes, depot, 0.5, 0.5)
+        assert math.isclose(score, expected, rel_tol=1e-9)
+    assert giant_tour_neighbor([3], make_rng(0)) == [3]
@@ -0,0 +1,53 @@
+import random
+
+from local_search import local_search
+
+
+def random_instance(rng, n, n_vehicles):
+    orders = [
+        {
+            "id": i,
+            "weight": rng.randint(1, 5),
+            "volume": rng.randint(1, 5),
+            "location": {"lat": 10 + rng.random(), "lng": 93 + rng.random()},
+        }
+        for i in range(n)
+    ]
+    capacity = 3 * n // n_vehicles + 5
+    vehicles = [
+        {"id": k, "capacity_weight": capacity, "capacity_volume": capacity}
+        for k in range(n_vehicles)
+    ]
+    return orders, vehicles, {"lat": 10.5, "lng": 93.5}
+
+
+# The polish ends at a local optimum, so polishing its output changes nothing
+def test_second_polish_never_improves():
+    rng = random.Random(0)
+    for trial in range(200):
+        n = rng.randint(2, 25)
+        orders, vehicles, depot = random_instance(rng, n, rng.randint(1, 4))
+        weight_distance, weight_time = rng.choice([(0.5, 0.5), (1, 0), (0, 1), (0.2, 3)])
+        routes = [orders[k :: len(vehicles)] for k in range(len(vehicles))]
+        strategy = "first" if trial % 2 else "best"
+
+        polished, score = local_search(
+            routes,
+            vehicles,
+            depot,
+            weight_distance,
+            weight_time,
+            strategy=strategy,
+            neighbor_count=n,
+        )
+        again, again_score = local_search(
+            polished,
+            vehicles,
+            depot,
+            weight_distance,
+            weight_time,
+            strategy=strategy,
+            neighbor_count=n,
+        )
+        assert again_score == score
+        assert again == polished
@@ -0,0 +1,41 @@
+import random
+
+from pareto import ParetoArchive, weakly_dominates
+
+
+# Linear archive with the same rules: ties and dominated points are rejected,
+# points the newcomer dominates are dropped
+def brute_force_front(points):
+    front = []
+    for point in points:
+        if any(weakly_dominates(kept, point) for kept in front):
+            continue
+        front = [kept for kept in front if not weakly_dominates(point, kept)]
+        front.append(point)
+    return sorted(front)
+
+
+def test_archive_matches_brute_force():
+    rng = random.Random(0)
+    for trial in range(60):
+        dimensions = 2 + trial % 3
+        # Small integer ranges produce ties and partial dominance; in odd trials
+        # the last objective trades off against the others, giving large fronts
+        points = []
+        for _ in range(400):
+            point = [rng.randint(0, 30) for _ in range(dimensions - 1)]
+            if trial % 2:
+                point.append(15 * len(point) - sum(point) + rng.randint(0, 5))
+            else:
+                point.append(rng.randint(0, 30))
+            points.append(tuple(point))
+        archive = ParetoArchive(max_leaf=4, branching=3)
+        added = [archive.add(point, index) for index, point in enumerate(points)]
+
+        expected = brute_force_front(points)
+        assert sorted(objectives for objectives, _ in archive) == expected
+        assert len(archive) == len(expected)
+        assert [objectives for objectives, _ in archive.front()] == expected
+        # Each archived solution is the first arrival of its objectives
+        for objectives, index in archive:
+            assert points[index] == objectives and added[index]
@@ -0,0 +1,32 @@
+import annealing
+from annealing import generate_neighbor, make_rng
+from tabu import ZobristTabu
+
+
+# Random walk over the sample instance, taking every neighbor: the hash updated
+# from the recorded edges must equal a full rehash after every move
+def test_incremental_hash_matches_full_hash():
+    orders, vehicles = annealing.orders, annealing.vehicles
+    tabu = ZobristTabu(orders, len(vehicles))
+    rng = make_rng(0)
+    routes = [orders[k :: len(vehicles)] for k in range(len(vehicles))]
+    h = tabu.solution_hash(routes)
+    for _ in range(5000):
+        edges = []
+        _, routes = generate_neighbor(routes, rng, edges=edges)
+        h = tabu.toggle(h, edges)
+        assert h == tabu.solution_hash(routes)
+
+
+# A single vehicle only allows 2-opt; its hash must still track the route
+def test_incremental_hash_single_route():
+    orders = annealing.orders[:12]
+    tabu = ZobristTabu(orders, 1)
+    rng = make_rng(1)
+    routes = [list(orders)]
+    h = tabu.solution_hash(routes)
+    for _ in range(2000):
+        edges = []
+        _, routes = generate_neighbor(routes, rng, edges=edges)
+        h = tabu.toggle(h, edges)
+        assert h == tabu.solution_hash(routes)
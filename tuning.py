@@ -0,0 +1,242 @@
+import argparse
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import annealing
+from annealing import MOVE_TYPES, simulated_annealing
+from bounds import instance_bounds, optimality_gap
+from chains import chain_seeds
+
+# Upper order count of each size class; tuned profiles are kept per class
+SIZE_CLASSES = [("small", 200), ("medium", 2000), ("large", 20000), ("huge", math.inf)]
+
+
+def size_class(instance):
+    n = len(instance["orders"])
+    return next(name for name, limit in SIZE_CLASSES if n <= limit)
+
+
+# The hand-picked module-level parameters, always raced as one of the configs
+def default_config():
+    return {
+        "initial_temp": annealing.initial_temp,
+        "cooling_rate": annealing.cooling_rate,
+        "move_weights": [1.0] * len(MOVE_TYPES),
+    }
+
+
+# Random configs: initial_temp log-uniform over [10, 1e5], 1 - cooling_rate
+# log-uniform over [1e-6, 1e-2] and move weights from a flat Dirichlet
+def sample_configs(n, rng):
+    configs = [default_config()]
+    for _ in range(n - 1):
+        configs.append(
+            {
+                "initial_temp": float(10 ** rng.uniform(1, 5)),
+                "cooling_rate": float(1 - 10 ** rng.uniform(-6, -2)),
+                "move_weights": rng.dirichlet(np.ones(len(MOVE_TYPES))).tolist(),
+            }
+        )
+    return configs
+
+
+# One race entry: anneal an instance with a config for a fixed wall-clock budget
+# and return the gap to the instance's lower bound, comparable across instances
+def evaluate_config(task):
+    config, instance, lower_bound, seed, params = task
+    _, best_score = simulated_annealing(
+        instance["vehicles"],
+        instance["orders"],
+        instance["depot_location"],
+        config["initial_temp"],
+        config["cooling_rate"],
+        params["max_iterations"],
+        params["weight_distance"],
+        params["weight_time"],
+        rng=seed,
+        move_weights=config["move_weights"],
+        time_limit=params["time_budget"],
+    )
+    return optimality_gap(best_score, lower_bound)
+
+
+# Race configs by successive halving. Each round runs every surviving config on
+# the next instances_per_round (instance, seed) pairs, all configs on the same
+# pairs, then keeps the best 1/eta by mean gap over every pair seen so far.
+# Pairs cycle through the instances with fresh seeds. Returns the ranked
+# survivors of the last round as (config, mean_gap, runs).
+def successive_halving(
+    configs,
+    instances,
+    params,
+    eta=2,
+    instances_per_round=2,
+    master_seed=42,
+    workers=None,
+):
+    lower_bounds = [
+        instance_bounds(
+            instance["vehicles"],
+            instance["orders"],
+            instance["depot_location"],
+            params["weight_distance"],
+            params["weight_time"],
+        )["lower_bound"]
+        for instance in instances
+    ]
+    # An instance whose fleet cannot carry the load scores every config an
+    # infinite gap, which would hide all differences in the mean
+    solvable = [i for i, bound in enumerate(lower_bounds) if bound < math.inf]
+    if not solvable:
+        raise ValueError("No training instance has a fleet that can carry its load")
+    instances = [instances[i] for i in solvable]
+    lower_bounds = [lower_bounds[i] for i in solvable]
+    rounds = max(1, math.ceil(math.log(len(configs), eta)))
+    seeds = chain_seeds(master_seed, rounds * instances_per_round)
+    gaps = {k: [] for k in range(len(configs))}
+    survivors = list(range(len(configs)))
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        for round_number in range(rounds):
+            pairs = [
+                (pair % len(instances), seeds[pair])
+                for pair in range(
+                    round_number * instances_per_round,
+                    (round_number + 1) * instances_per_round,
+                )
+            ]
+            tasks = [
+                (configs[k], instances[i], lower_bounds[i], seed, params)
+                for k in survivors
+                for i, seed in pairs
+            ]
+            if pool is None:
+                results = [evaluate_config(task) for task in tasks]
+            else:
+                results = list(pool.map(evaluate_config, tasks))
+            for t, gap in enumerate(results):
+                gaps[survivors[t // len(pairs)]].append(gap)
+
+            # Ties keep the earlier config, so the default wins an even race
+            survivors.sort(key=lambda k: np.mean(gaps[k]))
+            if round_number < rounds - 1:
+                survivors = survivors[: max(1, len(survivors) // eta)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return [(configs[k], float(np.mean(gaps[k])), len(gaps[k])) for k in survivors]
+
+
+# Tune one profile per size class present in the training instances.
+# Returns {size class: config with its mean gap and run count}. A config is only
+# tuned for the stopping rule it raced under, so each profile also records the
+# time budget and iteration cap, for batch to solve under the same rule.
+def tune(
+    instances,
+    n_configs=16,
+    time_budget=2.0,
+    weight_distance=annealing.weight_distance,
+    weight_time=annealing.weight_time,
+    max_iterations=10**9,
+    eta=2,
+    instances_per_round=2,
+    master_seed=annealing.seed,
+    workers=None,
+):
+    params = {
+        "time_budget": time_budget,
+        "max_iterations": max_iterations,
+        "weight_distance": weight_distance,
+        "weight_time": weight_time,
+    }
+    classes = {}
+    for instance in instances:
+        classes.setdefault(size_class(instance), []).append(instance)
+
+    profiles = {}
+    for name, _ in SIZE_CLASSES:
+        if name not in classes:
+            continue
+        configs = sample_configs(n_configs, np.random.default_rng(master_seed))
+        ranked = successive_halving(
+            configs,
+            classes[name],
+            params,
+            eta=eta,
+            instances_per_round=instances_per_round,
+            master_seed=master_seed,
+            workers=workers,
+        )
+        config, mean_gap, runs = ranked[0]
+        profiles[name] = dict(
+            config,
+            time_budget=time_budget,
+            max_iterations=max_iterations,
+            mean_gap=mean_gap,
+            runs=runs,
+        )
+    return profiles
+
+
+# Annealing parameters and stopping rule for an instance from a tuned profile,
+# or {} if its size class was not tuned. Profiles written before the stopping
+# rule was recorded give only the annealing parameters.
+def profile_params(profiles, instance):
+    profile = profiles.get(size_class(instance))
+    if profile is None:
+        return {}
+    params = {key: profile[key] for key in ("initial_temp", "cooling_rate", "move_weights")}
+    if profile.get("time_budget") is not None:
+        params["time_limit"] = profile["time_budget"]
+        params["max_iterations"] = profile["max_iterations"]
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tune annealing parameters per instance size class by successive halving."
+    )
+    parser.add_argument(
+        "source", help="training instances: a directory of .json files, a .jsonl file, or -"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="profile JSON file (default: stdout)"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--configs", type=int, default=16)
+    parser.add_argument(
+        "--time-budget", type=float, default=2.0, help="seconds per annealing run"
+    )
+    parser.add_argument("--eta", type=int, default=2, help="keep 1/eta configs per round")
+    parser.add_argument("--instances-per-round", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=annealing.seed)
+    args = parser.parse_args(argv)
+
+    from batch import load_instances
+
+    profiles = tune(
+        list(load_instances(args.source)),
+        n_configs=args.configs,
+        time_budget=args.time_budget,
+        eta=args.eta,
+        instances_per_round=args.instances_per_round,
+        master_seed=args.seed,
+        workers=args.workers,
+    )
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        json.dump(profiles, output, indent=2)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
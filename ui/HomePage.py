@@ -1,35 +1,190 @@
+import sys
+from pathlib import Path
+
+import io
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-from io import StringIO
-import json
+import pydeck as pdk
+
+# The solver modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import annealing
+from data_prep import (
+    compact_instance,
+    file_digest,
+    instance_from_dataframe,
+    page_count,
+    page_rows,
+)
+from solver_job import SolverJob
+
+ROUTE_COLORS = [
+    [230, 25, 75],
+    [60, 180, 75],
+    [0, 130, 200],
+    [245, 130, 48],
+    [145, 30, 180],
+    [70, 240, 240],
+    [240, 50, 230],
+    [128, 128, 0],
+]
+
+
+PAGE_SIZES = [25, 100, 500]
+
+
+# Parse an upload once per distinct content; reruns and re-uploads of the same
+# file hit the cache. The raw bytes are not hashed by Streamlit (leading underscore).
+@st.cache_data(max_entries=8, show_spinner="Reading CSV...")
+def load_dataframe(digest, _data):
+    return pd.read_csv(io.BytesIO(_data))
+
+
+# The instance and its compact arrays are shared, not copied, across reruns;
+# the solver never mutates them
+@st.cache_resource(max_entries=8, show_spinner="Preparing instance...")
+def prepare_instance(digest, _dataframe):
+    instance = instance_from_dataframe(_dataframe)
+    return instance, compact_instance(instance)
+
+
+# Map layers: one polyline per vehicle route (depot -> orders -> depot), plus orders and depot
+def route_map(instance, compact, solution):
+    depot = instance["depot_location"]
+    depot_point = [depot["lng"], depot["lat"]]
+    paths = [
+        {
+            "vehicle": vehicle["id"],
+            "orders": len(route),
+            "path": [depot_point]
+            + [[order["location"]["lng"], order["location"]["lat"]] for order in route]
+            + [depot_point],
+            "color": ROUTE_COLORS[k % len(ROUTE_COLORS)],
+        }
+        for k, (vehicle, route) in enumerate(zip(instance["vehicles"], solution))
+        if route
+    ]
+    points = pd.DataFrame({"lng": compact["lng"], "lat": compact["lat"]})
+    return pdk.Deck(
+        layers=[
+            pdk.Layer(
+                "PathLayer",
+                data=paths,
+                get_path="path",
+                get_color="color",
+                width_min_pixels=3,
+                pickable=True,
+            ),
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=points,
+                get_position=["lng", "lat"],
+                get_fill_color=[40, 40, 40],
+                radius_min_pixels=3,
+            ),
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=[{"position": depot_point}],
+                get_position="position",
+                get_fill_color=[0, 0, 0],
+                radius_min_pixels=8,
+            ),
+        ],
+        initial_view_state=pdk.ViewState(
+            latitude=depot["lat"], longitude=depot["lng"], zoom=4
+        ),
+        tooltip={"text": "Vehicle {vehicle}: {orders} orders"},
+    )
+
 
-loc = [[18.867962678748306, 83.02193878023306]]
 st.title("ULIP HACKATHON")
 # File uploader widget
 uploaded_file = st.file_uploader("Choose a CSV file")
 
+instance = compact = None
 if uploaded_file is not None:
-    # Read the CSV file into a DataFrame
-    dataframe = pd.read_csv(uploaded_file)
-    
-    # Display the DataFrame
-    st.write("DataFrame:", dataframe)
-
-    # Convert DataFrame to JSON
-    json_data = dataframe.to_json(orient="records")  # Convert to JSON format
-
-    # Parse JSON string for pretty printing
-    parsed_json = json.loads(json_data)
-    
-    # Display JSON
-    st.write("JSON Data:", json.dumps(parsed_json, indent=4))
-
-result = st.button("RUN");
+    # Hash each upload once; the digest keys every cached preparation step
+    if st.session_state.get("upload_id") != uploaded_file.file_id:
+        st.session_state["upload_id"] = uploaded_file.file_id
+        st.session_state["upload_digest"] = file_digest(uploaded_file.getvalue())
+    digest = st.session_state["upload_digest"]
+    dataframe = load_dataframe(digest, uploaded_file.getvalue())
+
+    # Paginated preview instead of rendering the whole file
+    page_size = st.selectbox("Rows per page", PAGE_SIZES)
+    n_pages = page_count(len(dataframe), page_size)
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages)
+    rows = page_rows(len(dataframe), int(page), page_size)
+    page_frame = dataframe.iloc[rows]
+    st.write(f"DataFrame: rows {rows.start + 1}-{rows.stop} of {len(dataframe)}")
+    st.dataframe(page_frame)
+    with st.expander("JSON Data (this page)"):
+        st.json(page_frame.to_json(orient="records"))
+
+    try:
+        instance, compact = prepare_instance(digest, dataframe)
+    except (KeyError, ValueError) as error:
+        st.error(f"Could not read the instance: {error}")
+    else:
+        st.write(
+            f"{len(instance['orders'])} orders, {len(instance['vehicles'])} vehicles, "
+            f"load {compact['weight'].sum():.0f} / {compact['capacity_weight']:.0f} weight, "
+            f"{compact['volume'].sum():.0f} / {compact['capacity_volume']:.0f} volume"
+        )
+
+job = st.session_state.get("job")
+running = job is not None and not job.done
+
+max_iterations = st.number_input(
+    "Iterations", min_value=100, value=annealing.max_iterations, step=1000
+)
+result = st.button("RUN", disabled=instance is None or running)
 if result:
-    df = pd.DataFrame(
-        loc
-    ,
-    columns=["lat", "lon"],
+    params = {
+        "initial_temp": annealing.initial_temp,
+        "cooling_rate": annealing.cooling_rate,
+        "max_iterations": int(max_iterations),
+        "weight_distance": annealing.weight_distance,
+        "weight_time": annealing.weight_time,
+        "polish": annealing.polish,
+        "seed": annealing.seed,
+    }
+    st.session_state["job"] = SolverJob(instance, params).start()
+    st.session_state["job_compact"] = compact
+    st.session_state["job_finish_seen"] = False
+
+
+# Polls the background job; only this fragment reruns, so the page stays responsive
+@st.fragment(run_every=1.0)
+def show_job():
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    snapshot = job.snapshot()
+    if job.error is not None:
+        st.error(f"Solver failed: {job.error}")
+        return
+
+    status = "Done" if snapshot["done"] else "Running"
+    if snapshot["best_score"] is None:
+        st.write(f"{status}: waiting for the first solution...")
+        return
+    st.write(
+        f"{status}: iteration {snapshot['iteration']}, "
+        f"best score {snapshot['best_score']:.2f}, {snapshot['elapsed']:.1f}s"
+    )
+    st.pydeck_chart(
+        route_map(
+            job.instance, st.session_state["job_compact"], snapshot["best_solution"]
+        )
     )
-    st.map(df)
\ No newline at end of file
+
+    # Rerun the whole page once when the job ends so RUN is enabled again
+    if snapshot["done"] and not st.session_state.get("job_finish_seen"):
+        st.session_state["job_finish_seen"] = True
+        st.rerun()
+
+
+show_job()
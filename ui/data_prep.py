@@ -0,0 +1,80 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# Turn an id read as float (because of empty cells) back into an int
+def _clean_id(value):
+    return int(value) if float(value).is_integer() else value
+
+
+# Build a solver instance from the flattened CSV layout of result.csv:
+# vehicles__*, orders__* and depot_location__* columns, with blank cells where
+# a section has fewer rows than the others.
+def instance_from_dataframe(dataframe):
+    vehicle_rows = dataframe.dropna(subset=["vehicles__id"])
+    order_rows = dataframe.dropna(subset=["orders__id"])
+    depot_rows = dataframe.dropna(subset=["depot_location__lat", "depot_location__lng"])
+    if vehicle_rows.empty or order_rows.empty or depot_rows.empty:
+        raise ValueError("The CSV needs at least one vehicle, one order and a depot")
+
+    vehicles = [
+        {
+            "id": _clean_id(row.vehicles__id),
+            "capacity_weight": float(row.vehicles__capacity_weight),
+            "capacity_volume": float(row.vehicles__capacity_volume),
+        }
+        for row in vehicle_rows.itertuples(index=False)
+    ]
+    orders = [
+        {
+            "id": _clean_id(row.orders__id),
+            "weight": float(row.orders__weight),
+            "volume": float(row.orders__volume),
+            "location": {
+                "lat": float(row.orders__location__lat),
+                "lng": float(row.orders__location__lng),
+            },
+        }
+        for row in order_rows.itertuples(index=False)
+    ]
+    depot = depot_rows.iloc[0]
+    depot_location = {
+        "lat": float(depot["depot_location__lat"]),
+        "lng": float(depot["depot_location__lng"]),
+    }
+    return {"vehicles": vehicles, "orders": orders, "depot_location": depot_location}
+
+
+def read_instance_csv(uploaded_file):
+    return instance_from_dataframe(pd.read_csv(uploaded_file))
+
+
+# Content hash of an upload; caches are keyed on this rather than the file name
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Compact column arrays of an instance for maps and summaries
+def compact_instance(instance):
+    orders = instance["orders"]
+    return {
+        "order_ids": np.array([order["id"] for order in orders]),
+        "lat": np.array([order["location"]["lat"] for order in orders]),
+        "lng": np.array([order["location"]["lng"] for order in orders]),
+        "weight": np.array([order["weight"] for order in orders]),
+        "volume": np.array([order["volume"] for order in orders]),
+        "capacity_weight": sum(v["capacity_weight"] for v in instance["vehicles"]),
+        "capacity_volume": sum(v["capacity_volume"] for v in instance["vehicles"]),
+    }
+
+
+# Preview pagination; pages count from 1
+def page_count(n_rows, page_size):
+    return max((n_rows + page_size - 1) // page_size, 1)
+
+
+def page_rows(n_rows, page, page_size):
+    start = (page - 1) * page_size
+    return slice(start, min(start + page_size, n_rows))
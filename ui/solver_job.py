@@ -0,0 +1,71 @@
+import threading
+import time
+
+from annealing import simulated_annealing
+
+
+# A solve running on a background thread. The page keeps the job in
+# st.session_state and polls snapshot() on every rerun; the solver pushes each
+# new best solution through its progress callback.
+class SolverJob:
+    def __init__(self, instance, params):
+        self.instance = instance
+        self.params = params
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._iteration = 0
+        self._best_solution = None
+        self._best_score = None
+        self._done = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _on_progress(self, iteration, best_solution, best_score):
+        with self._lock:
+            self._iteration = iteration
+            self._best_solution = best_solution
+            self._best_score = best_score
+
+    def _run(self):
+        instance, params = self.instance, self.params
+        try:
+            best_solution, best_score = simulated_annealing(
+                instance["vehicles"],
+                instance["orders"],
+                instance["depot_location"],
+                params["initial_temp"],
+                params["cooling_rate"],
+                params["max_iterations"],
+                params["weight_distance"],
+                params["weight_time"],
+                polish=params["polish"],
+                rng=params["seed"],
+                progress=self._on_progress,
+            )
+            self._on_progress(params["max_iterations"], best_solution, best_score)
+        except Exception as error:  # surfaced to the page instead of dying silently
+            self.error = error
+        finally:
+            with self._lock:
+                self._done = True
+                self.finished_at = time.time()
+
+    @property
+    def done(self):
+        with self._lock:
+            return self._done
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "iteration": self._iteration,
+                "best_solution": self._best_solution,
+                "best_score": self._best_score,
+                "done": self._done,
+                "elapsed": (self.finished_at or time.time()) - self.started_at,
+            }